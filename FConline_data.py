@@ -0,0 +1,1269 @@
+"""
+Streamlit에 의존하지 않는 데이터 처리 함수 모음
+(FConline_webpage.py와 벤치마크/동기화 스크립트가 함께 사용)
+"""
+import bisect
+import datetime
+import fcntl
+import hashlib
+import heapq
+import io
+import itertools
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from PIL import Image
+from redshift_connector.utils.oids import RedshiftOID
+
+##########################################################################
+# 컬럼 단위 결과 조회
+FETCH_BATCH_ROWS = 10000  # 한 번에 꺼내는 행 수
+
+INTEGER_TYPES = {RedshiftOID.SMALLINT, RedshiftOID.INTEGER, RedshiftOID.BIGINT}
+FLOAT_TYPES = {RedshiftOID.REAL, RedshiftOID.FLOAT}
+BOOLEAN_TYPES = {RedshiftOID.BOOLEAN}
+
+# 한 컬럼의 값(object 배열)을 타입에 맞는 NumPy 배열로 변환 (숫자가 아닌 컬럼은 그대로)
+def column_array(values, type_code):
+    if type_code in INTEGER_TYPES:
+        try:
+            return values.astype(np.int64)
+        except TypeError:  # NULL이 있으면 pandas처럼 float(NaN)으로
+            return values.astype(np.float64)
+    if type_code in FLOAT_TYPES:
+        return values.astype(np.float64)
+    if type_code in BOOLEAN_TYPES and not pd.isna(values).any():  # NULL이 있으면 pandas처럼 object로
+        return values.astype(bool)
+    return values
+
+def fetch_columnar(cursor, batch_rows=FETCH_BATCH_ROWS) -> pd.DataFrame:
+    """
+    cursor: 쿼리를 실행한 redshift_connector 커서
+    반환값: 결과 DataFrame
+
+    fetchall()로 모든 행을 튜플로 받은 뒤 DataFrame을 만드는 대신,
+    batch_rows개씩 꺼내 바로 컬럼별 배열로 옮긴다.
+    - 정수/실수/불리언 컬럼은 배치마다 NumPy 배열로 바꾸고, 나머지 컬럼은 마지막에 pandas가 변환
+    - 꺼낸 행은 바로 버려지므로 모든 행 객체와 전체 크기의 2차원 object 배열을 동시에 들고 있지 않음
+    """
+    description = cursor.description
+    columns = [desc[0] for desc in description]
+    type_codes = [desc[1] for desc in description]
+    parts = [[] for _ in columns]  # 컬럼별 배치 배열
+
+    while True:
+        rows = cursor.fetchmany(batch_rows)
+        if not rows:
+            break
+        block = np.empty((len(rows), len(columns)), dtype=object)
+        block[:] = rows
+        del rows
+        for i in range(len(columns)):
+            parts[i].append(column_array(block[:, i], type_codes[i]))
+        del block
+
+    data = {}
+    for i in range(len(columns)):
+        if not parts[i]:  # 결과가 없으면 pandas처럼 object 컬럼
+            data[i] = np.array([], dtype=object)
+        elif len(parts[i]) == 1:
+            data[i] = parts[i][0]
+        else:
+            data[i] = np.concatenate(parts[i])
+    df = pd.DataFrame(data, copy=False)
+    df.columns = columns
+    return df
+
+##########################################################################
+# 포지션 카테고리: 포지션 id(0~28) -> gk/df/mf/fw/sub
+POSITION_CATEGORIES = {
+    "gk": [0],
+    "df": [1, 2, 3, 4, 5, 6, 7, 8],
+    "mf": [9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19],
+    "fw": [20, 21, 22, 23, 24, 25, 26, 27],
+    "sub": [28],
+}
+DEFAULT_POSITION_CATEGORY = "mf"  # 목록에 없는 포지션 id (NULL 포함)
+
+# 배열 인덱스 = 포지션 id
+position_category_table = np.full(max(max(ids) for ids in POSITION_CATEGORIES.values()) + 1, DEFAULT_POSITION_CATEGORY, dtype=object)
+for category, ids in POSITION_CATEGORIES.items():
+    position_category_table[ids] = category
+
+def position_category(positions) -> np.ndarray:
+    """
+    positions: 포지션 id 배열 (Series, 리스트 등)
+    반환값: 같은 길이의 카테고리 배열 (배열 인덱싱 한 번으로 변환)
+    """
+    positions = np.asarray(positions)
+    in_range = (positions >= 0) & (positions < len(position_category_table))
+    categories = np.full(len(positions), DEFAULT_POSITION_CATEGORY, dtype=object)
+    categories[in_range] = position_category_table[positions[in_range].astype(np.int64)]
+    return categories
+
+# 쿼리에서 조인/필터에 쓰는 포지션 카테고리 CTE (position_id, position_cat)
+def position_category_sql() -> str:
+    rows = " UNION ALL\n        ".join(
+        f"SELECT {position_id} AS position_id, '{category}' AS position_cat"
+        for position_id, category in enumerate(position_category_table)
+    )
+    return f"""position_category AS (
+        {rows}
+    )"""
+
+# 포지션 카테고리 하나로 거르는 WHERE 조건 (position_category CTE 필요, 카테고리를 %s 두 곳에 같은 값으로 바인딩)
+# 원래 컬럼을 그대로 비교하고, 목록에 없는 id와 NULL은 DEFAULT_POSITION_CATEGORY일 때만 포함
+def position_filter_sql(column='"position"') -> str:
+    return f"""({column} IN (SELECT position_id FROM position_category WHERE position_cat = %s)
+        OR (%s = '{DEFAULT_POSITION_CATEGORY}' AND ({column} IS NULL OR {column} NOT BETWEEN 0 AND {len(position_category_table) - 1})))"""
+
+##########################################################################
+# 로컬 Parquet 스냅샷 (snapshot_sync.py로 저장, duckdb 모드에서 조회)
+SNAPSHOT_TABLES = [
+    "ranking_info",
+    "match_info",
+    "player_info",
+    "season_info",
+    "division_info",
+    "position_info",
+    "team_color_info",
+    "player_review_info",
+    "player_image_info",
+]
+DEFAULT_SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshot")
+SNAPSHOT_MANIFEST = "_manifest.json"
+
+def snapshot_path(snapshot_dir, table):
+    return os.path.join(snapshot_dir, f"{table}.parquet")
+
+def open_snapshot(snapshot_dir=DEFAULT_SNAPSHOT_DIR):
+    """
+    snapshot_dir: Parquet 파일이 있는 폴더
+    반환값: analytics.<테이블> 뷰가 만들어진 DuckDB 연결 (메모리 DB)
+
+    뷰는 쿼리할 때마다 Parquet 파일을 읽으므로 스냅샷을 다시 저장하면 바로 반영된다.
+    스레드마다 반환값.cursor()로 연결을 따로 만들어 사용한다.
+    """
+    import duckdb
+
+    missing = [table for table in SNAPSHOT_TABLES if not os.path.exists(snapshot_path(snapshot_dir, table))]
+    if missing:
+        raise FileNotFoundError(f"스냅샷 파일이 없습니다: {', '.join(missing)} (python snapshot_sync.py로 먼저 저장하세요)")
+
+    database = duckdb.connect(":memory:")
+    database.execute("CREATE SCHEMA analytics")
+    for table in SNAPSHOT_TABLES:
+        path = snapshot_path(snapshot_dir, table).replace("'", "''")
+        database.execute(f"CREATE VIEW analytics.{table} AS SELECT * FROM read_parquet('{path}')")
+    return database
+
+# Redshift용 쿼리를 DuckDB에서 실행할 수 있게 바꾸는 함수
+def to_duckdb_sql(query):
+    query = query.replace("%s", "?")  # 바인딩 자리 표시
+    # Redshift는 LEFT(숫자, n)을 문자열로 자동 변환하지만 DuckDB는 명시적으로 변환해야 함
+    query = re.sub(r"LEFT\(\s*([^,()]+?)\s*,\s*(\d+)\s*\)", r"LEFT(CAST(\1 AS VARCHAR), \2)", query)
+    return query
+
+##########################################################################
+# 스냅샷 테이블의 최신 스냅샷만 읽기 (ranking_info는 적재할 때마다 created_at이 같은 전체 랭킹이 쌓임)
+# 테이블 이름 다음에 별칭 대신 올 수 있는 키워드
+SQL_CLAUSE_KEYWORDS = {
+    "WHERE", "GROUP", "ORDER", "LIMIT", "JOIN", "LEFT", "RIGHT", "INNER", "OUTER", "FULL", "CROSS",
+    "ON", "USING", "UNION", "EXCEPT", "INTERSECT", "HAVING", "WINDOW", "QUALIFY",
+}
+
+def latest_snapshot_sql(query, table, created_at) -> str:
+    """
+    query의 analytics.<table>을 created_at = 주어진 시각인 행만 읽는 서브쿼리로 바꾼 SQL
+    - 시각을 상수로 넣으므로 Redshift(zone map)와 DuckDB(Parquet row group 통계)가 다른 스냅샷 블록을 건너뜀
+    - 별칭이 없으면 테이블 이름을 별칭으로 붙여 컬럼 참조가 그대로 동작
+    """
+    timestamp = pd.Timestamp(created_at).strftime("%Y-%m-%d %H:%M:%S.%f")
+    subquery = f"(SELECT * FROM analytics.{table} WHERE created_at = TIMESTAMP '{timestamp}')"
+
+    def replace(match):
+        alias = match.group(2)
+        if alias is not None and alias.upper() not in SQL_CLAUSE_KEYWORDS:
+            return subquery + match.group(1)
+        return f"{subquery} AS {table}{match.group(1) or ''}"
+    return re.sub(rf"analytics\.{table}\b(\s+(?:AS\s+)?(\w+))?", replace, query, flags=re.IGNORECASE)
+
+##########################################################################
+# 쿼리/이미지 확인 텔레메트리 (최근 이벤트만 메모리에 보관)
+TELEMETRY_MAX_EVENTS = 20000  # 링 버퍼 크기 (넘으면 오래된 이벤트부터 버림)
+LATENCY_BUCKETS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]  # 히스토그램 구간 상한(ms)
+
+@dataclass(frozen=True)
+class TelemetryEvent:
+    timestamp: float
+    kind: str  # "query" / "image"
+    template: str  # 쿼리 템플릿 id 또는 이미지 확인 종류
+    latency: float  # 초
+    cache_hit: bool = None  # None: 캐시와 무관
+    rows: int = None
+    result_bytes: int = None
+    error: bool = False
+
+# 공백만 다른 쿼리는 같은 템플릿으로 취급 (바인딩 값은 템플릿에 포함되지 않음)
+@lru_cache(maxsize=1024)
+def query_template_id(query) -> str:
+    return hashlib.sha1(" ".join(query.split()).encode()).hexdigest()[:8]
+
+def latency_bucket(latency_ms) -> str:
+    for upper in LATENCY_BUCKETS_MS:
+        if latency_ms <= upper:
+            return f"≤{upper}ms"
+    return f">{LATENCY_BUCKETS_MS[-1]}ms"
+
+class Telemetry:
+    """
+    지연 시간, 행 수, 결과 크기, 캐시 적중 여부를 이벤트 단위로 기록
+    - 최근 max_events개만 deque(링 버퍼)에 보관하므로 메모리 사용량이 일정함
+    - 집계(summary/histogram)는 조회할 때 버퍼에 남은 이벤트로 계산
+    """
+    def __init__(self, max_events=TELEMETRY_MAX_EVENTS):
+        self._events = deque(maxlen=max_events)
+        self._templates = {}  # 템플릿 id -> {"name": 이름, "tables": 읽는 테이블, "sql": 쿼리}
+        self._lock = threading.Lock()
+
+    def register_query(self, query, name=None) -> str:
+        template = query_template_id(query)
+        if template not in self._templates or (name and not self._templates[template]["name"]):
+            with self._lock:
+                self._templates[template] = {
+                    "name": name,
+                    "tables": ", ".join(sorted(set(re.findall(r"analytics\.(\w+)", query)))),
+                    "sql": query.strip(),
+                }
+        return template
+
+    def record(self, kind, template, latency, **fields):
+        self._events.append(TelemetryEvent(time.time(), kind, template, latency, **fields))
+
+    def clear(self):
+        self._events.clear()
+
+    def templates(self) -> dict:
+        with self._lock:
+            return dict(self._templates)
+
+    def events(self) -> pd.DataFrame:
+        events = list(self._events)
+        df = pd.DataFrame(events, columns=list(TelemetryEvent.__dataclass_fields__))
+        df["latency_ms"] = df["latency"].astype(float) * 1000
+        return df
+
+    def summary(self) -> pd.DataFrame:
+        # (종류, 템플릿)별 호출 수, 캐시 적중률, 지연 시간 분위수, 평균 행 수/결과 크기, 오류 수
+        df = self.events()
+        columns = ["kind", "template", "name", "tables", "calls", "hit_ratio", "p50_ms", "p95_ms", "max_ms",
+                   "total_ms", "avg_rows", "avg_bytes", "errors"]
+        if df.empty:
+            return pd.DataFrame(columns=columns)
+        df["hit"] = df["cache_hit"].map({True: 1.0, False: 0.0})
+        df["rows"] = pd.to_numeric(df["rows"])
+        df["result_bytes"] = pd.to_numeric(df["result_bytes"])
+        latency = df.groupby(["kind", "template"])["latency_ms"]
+        summary = pd.DataFrame({
+            "calls": latency.size(),
+            "hit_ratio": df.groupby(["kind", "template"])["hit"].mean(),
+            "p50_ms": latency.quantile(0.5),
+            "p95_ms": latency.quantile(0.95),
+            "max_ms": latency.max(),
+            "total_ms": latency.sum(),
+            "avg_rows": df.groupby(["kind", "template"])["rows"].mean(),
+            "avg_bytes": df.groupby(["kind", "template"])["result_bytes"].mean(),
+            "errors": df.groupby(["kind", "template"])["error"].sum(),
+        }).reset_index()
+        templates = self.templates()
+        summary["name"] = summary["template"].map(lambda t: (templates.get(t) or {}).get("name"))
+        summary["tables"] = summary["template"].map(lambda t: (templates.get(t) or {}).get("tables"))
+        return summary[columns].sort_values("total_ms", ascending=False, ignore_index=True)
+
+    def histogram(self) -> pd.DataFrame:
+        # 템플릿별 지연 시간 구간(LATENCY_BUCKETS_MS) 분포: template, bucket, count
+        df = self.events()
+        labels = [latency_bucket(upper) for upper in LATENCY_BUCKETS_MS] + [latency_bucket(float("inf"))]
+        if df.empty:
+            return pd.DataFrame(columns=["template", "bucket", "count"])
+        df["bucket"] = pd.Categorical(df["latency_ms"].map(latency_bucket), categories=labels, ordered=True)
+        return df.groupby(["template", "bucket"], observed=False).size().rename("count").reset_index()
+
+##########################################################################
+# 랭커 닉네임 검색 (접두어 자동완성 + 오타 허용 검색)
+HANGUL_BASE, HANGUL_LAST = 0xAC00, 0xD7A3
+CHOSEONG_COMPAT = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"  # 입력 중인 자음(호환 자모) -> 초성
+NICKNAME_MAX_DISTANCE = 2  # 오타로 인정하는 최대 편집 거리 (자모 단위)
+NICKNAME_NEGATIVE_CACHE_SIZE = 4096  # 없는 닉네임 검색 결과를 기억하는 개수
+
+def nickname_key(name) -> str:
+    """
+    비교용 키: 대소문자/앞뒤 공백 무시, 한글 음절은 초성/중성/종성 자모로 분해
+    (예: "감독" -> "ㄱㅏㅁㄷㅗㄱ"에 해당하는 조합용 자모, "각"과 "감"의 거리가 1이 됨)
+    """
+    chars = []
+    for char in unicodedata.normalize("NFC", str(name).strip()).casefold():
+        code = ord(char)
+        if HANGUL_BASE <= code <= HANGUL_LAST:
+            offset = code - HANGUL_BASE
+            chars.append(chr(0x1100 + offset // 588))
+            chars.append(chr(0x1161 + offset % 588 // 28))
+            if offset % 28:
+                chars.append(chr(0x11A7 + offset % 28))
+        elif char in CHOSEONG_COMPAT:
+            chars.append(chr(0x1100 + CHOSEONG_COMPAT.index(char)))
+        elif 0x314F <= code <= 0x3163:  # 호환 자모 모음 -> 중성
+            chars.append(chr(0x1161 + code - 0x314F))
+        else:
+            chars.append(char)
+    return "".join(chars)
+
+def deletions(key, max_deletes) -> set:
+    # key에서 글자를 max_deletes개까지 지운 모든 문자열 (key 자신 포함)
+    results = {key}
+    frontier = {key}
+    for _ in range(max_deletes):
+        frontier = {word[:i] + word[i + 1:] for word in frontier for i in range(len(word))}
+        results |= frontier
+    return results
+
+def substitutions(words, alphabet, insert=False) -> list:
+    # words의 각 문자열에서 한 글자를 alphabet 글자로 바꾼 문자열 (insert면 한 글자를 끼워 넣은 문자열도)
+    results = [word[:i] + char + word[i + 1:] for word in words for i in range(len(word)) for char in alphabet]
+    if insert:
+        results += [word[:i] + char + word[i:] for word in words for i in range(len(word) + 1) for char in alphabet]
+    return results
+
+def query_variants(key, max_distance, alphabet):
+    """
+    검색어 쪽 후보 문자열 (중복 포함)
+    거리 max_distance 이내의 닉네임에서 삽입된 글자 하나(없으면 치환된 글자 하나)를 지운 문자열은
+    - 삽입이 있었으면: key를 max_distance - 1번 이내로 고친 문자열
+    - 없었으면: key에서 k개를 지우고 max_distance - k번(max_distance - 1번 이하) 이내로 치환한 문자열
+    중 하나이므로, 닉네임 쪽은 한 글자 지운 문자열만 색인해도 모두 찾음
+    """
+    for word in deletions(key, max_distance):
+        yield word
+        deleted = len(key) - len(word)
+        frontier = [word]
+        for changes in range(1, min(max_distance - 1, max_distance - deleted) + 1):
+            frontier = substitutions(frontier, alphabet, insert=deleted + changes < max_distance)
+            yield from frontier
+
+def edit_distance(a, b, max_distance) -> int:
+    # 레벤슈타인 거리 (max_distance를 넘으면 max_distance + 1)
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, char_b in enumerate(b, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return min(previous[-1], max_distance + 1)
+
+class NicknameIndex:
+    """
+    ranking_info의 닉네임으로 만든 메모리 인덱스
+    - exact: 정확히 일치(대소문자 무시)하는 닉네임
+    - complete: 접두어 자동완성 (정렬된 키에서 이분 탐색)
+    - suggest: 편집 거리 NICKNAME_MAX_DISTANCE 이내의 닉네임 (SymSpell 방식)
+      닉네임은 자모를 한 개까지 지운 문자열만 색인하고(메모리/빌드 시간이 닉네임 길이에 비례),
+      검색어 쪽에서 query_variants로 후보를 넓혀 찾은 뒤 실제 거리를 확인한다. (거리 max_distance 이내는 모두 찾음)
+      (닉네임 2만 개 기준 빌드 약 0.5초/66MB, 처음 보는 검색어의 suggest 약 20ms, 같은 검색어는 negative cache에서 바로 반환)
+    - resolve: 없는 닉네임은 추천 목록과 함께 기억(negative cache)해 같은 검색을 다시 계산하지 않음
+    """
+    def __init__(self, nicknames, rankings=None, max_distance=NICKNAME_MAX_DISTANCE,
+                 negative_cache_size=NICKNAME_NEGATIVE_CACHE_SIZE):
+        nicknames = list(nicknames)
+        rankings = list(rankings) if rankings is not None else range(len(nicknames))
+        self.max_distance = max_distance
+        self._rank = {}  # 닉네임 -> 순위 (추천 정렬용)
+        self._by_key = {}  # 키 -> 닉네임 목록
+        for nickname, ranking in zip(nicknames, rankings):
+            if nickname is None or nickname in self._rank:
+                continue
+            self._rank[nickname] = ranking
+            self._by_key.setdefault(nickname_key(nickname), []).append(nickname)
+        self._sorted_keys = sorted(self._by_key)
+        self._deletes = {}  # 자모를 한 개까지 지운 키 -> 원래 키 목록
+        for key in self._sorted_keys:
+            for variant in deletions(key, 1):
+                self._deletes.setdefault(variant, []).append(key)
+        self._alphabet = "".join(sorted(set().union(*self._by_key)))  # 색인된 키에 나오는 글자 (검색어 쪽 치환/삽입용)
+        self._negative_cache_size = negative_cache_size
+        self._negative = OrderedDict()  # 없는 검색어 -> 추천 목록
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._rank)
+
+    def _ordered(self, nicknames):
+        return sorted(nicknames, key=lambda nickname: (self._rank[nickname], nickname))
+
+    def exact(self, name):
+        # 반환값: 일치하는 닉네임 (대소문자만 다른 닉네임이 여러 개면 입력과 같은 것), 없으면 None
+        if name in self._rank:
+            return name
+        matches = self._by_key.get(nickname_key(name), [])
+        return self._ordered(matches)[0] if matches else None
+
+    def complete(self, prefix, limit=5, scan=200):
+        # prefix로 시작하는 닉네임을 순위순으로 (앞에서 scan개까지만 비교)
+        key = nickname_key(prefix)
+        if not key:
+            return []
+        start = bisect.bisect_left(self._sorted_keys, key)
+        matches = []
+        for candidate in itertools.islice(self._sorted_keys, start, start + scan):
+            if not candidate.startswith(key):
+                break
+            matches.extend(self._by_key[candidate])
+        return self._ordered(matches)[:limit]
+
+    def suggest(self, name, limit=5):
+        # 편집 거리가 가까운 순, 같으면 순위순
+        key = nickname_key(name)
+        candidates = set()
+        for variant in query_variants(key, self.max_distance, self._alphabet):
+            candidates.update(self._deletes.get(variant, ()))
+        scored = []
+        for candidate in candidates:
+            distance = edit_distance(key, candidate, self.max_distance)
+            if distance <= self.max_distance:
+                scored.extend((distance, self._rank[nickname], nickname) for nickname in self._by_key[candidate])
+        return [nickname for _, _, nickname in sorted(scored)[:limit]]
+
+    def resolve(self, name, limit=5):
+        """
+        name: 검색어
+        반환값: (일치하는 닉네임 또는 None, 추천 닉네임 목록)
+        """
+        nickname = self.exact(name)
+        if nickname is not None:
+            return nickname, [other for other in self.complete(name, limit + 1) if other != nickname][:limit]
+
+        with self._lock:
+            if name in self._negative:
+                self._negative.move_to_end(name)
+                return None, self._negative[name]
+        suggestions = list(dict.fromkeys(self.complete(name, limit) + self.suggest(name, limit)))[:limit]
+        with self._lock:
+            self._negative[name] = suggestions
+            if len(self._negative) > self._negative_cache_size:
+                self._negative.popitem(last=False)
+        return None, suggestions
+
+##########################################################################
+# 워터마크(created_at) 기반 증분 집계
+MIN_WATERMARK = datetime.datetime(1970, 1, 1)  # 아직 아무것도 집계하지 않았을 때의 워터마크
+WATERMARK_RECONCILE_INTERVAL = 24 * 60 * 60  # 워터마크 이하 전체 행 수를 다시 세는 최소 간격(초)
+
+# 워터마크 이후에 적재된 match_info 행을 (spid, 포지션)별로 집계
+# last_load_rows: 가장 최근 적재(created_at = 새 워터마크)의 행 수 (다음 갱신 때 재적재 확인용, 같은 쿼리에서 세어 어긋나지 않음)
+query_match_delta = """
+WITH last_load AS (
+    SELECT MAX(created_at) AS created_at
+    FROM analytics.match_info
+    WHERE created_at > %s
+)
+SELECT
+    mi.spid,
+    mi."position",
+    COUNT(*) AS num,
+    SUM(mi.spgrade) AS spgrade_sum,
+    COUNT(mi.spgrade) AS spgrade_count,
+    MAX(mi.created_at) AS last_created_at,
+    COUNT(CASE WHEN mi.created_at = l.created_at THEN 1 END) AS last_load_rows
+FROM analytics.match_info mi
+CROSS JOIN last_load l
+WHERE mi.created_at > %s
+GROUP BY mi.spid, mi."position";
+"""
+# 워터마크 이후에 적재된 ranking_info 행을 등급별로 집계
+query_ranking_delta = """
+WITH last_load AS (
+    SELECT MAX(created_at) AS created_at
+    FROM analytics.ranking_info
+    WHERE created_at > %s
+)
+SELECT
+    r.division_id,
+    SUM(r.team_worth) AS worth_sum,
+    COUNT(r.team_worth) AS worth_count,
+    COUNT(*) AS num,
+    MAX(r.created_at) AS last_created_at,
+    COUNT(CASE WHEN r.created_at = l.created_at THEN 1 END) AS last_load_rows
+FROM analytics.ranking_info r
+CROSS JOIN last_load l
+WHERE r.created_at > %s
+GROUP BY r.division_id;
+"""
+# 워터마크와 같은 시각에 적재된 행 수 (갱신할 때마다 확인, 조회량은 적재 한 번 크기로 일정)
+query_watermark_load_rows = """
+SELECT
+    (SELECT COUNT(*) FROM analytics.match_info WHERE created_at = %s) AS match_rows,
+    (SELECT COUNT(*) FROM analytics.ranking_info WHERE created_at = %s) AS ranking_rows;
+"""
+# 워터마크 이하의 전체 행 수 (전체 이력을 세므로 WATERMARK_RECONCILE_INTERVAL마다 한 번만 확인)
+query_watermark_rows = """
+SELECT
+    (SELECT COUNT(*) FROM analytics.match_info WHERE created_at <= %s) AS match_rows,
+    (SELECT COUNT(*) FROM analytics.ranking_info WHERE created_at <= %s) AS ranking_rows;
+"""
+# (이전 워터마크, 새 워터마크]에 적재된 match_info 행을 (등급, spid)별로 집계
+# 등급은 갱신 시점의 최신 ranking_info 스냅샷 기준 (랭커의 등급이 나중에 바뀌어도 이미 더한 행은 그대로)
+query_division_usage_delta = """
+SELECT
+    r.division_id,
+    mi.spid,
+    COUNT(*) AS num
+FROM analytics.match_info mi
+JOIN (
+    SELECT gamer_nickname, MIN(division_id) AS division_id
+    FROM analytics.ranking_info
+    WHERE created_at = (SELECT MAX(created_at) FROM analytics.ranking_info)
+    GROUP BY gamer_nickname
+) r ON mi.gamer_nickname = r.gamer_nickname
+WHERE mi.created_at > %s AND mi.created_at <= %s
+GROUP BY r.division_id, mi.spid;
+"""
+# 워터마크 이하 match_info의 (spid, 포지션)별 정확한 사용 수 (스케치 오차 확인용)
+query_usage_exact = """
+SELECT spid, "position", COUNT(*) AS num
+FROM analytics.match_info
+WHERE created_at <= %s
+GROUP BY spid, "position";
+"""
+
+SKETCH_CAPACITY = 1000  # 스케치 하나가 추적하는 최대 spid 수 (top-K보다 충분히 크게)
+SKETCH_ALL = "all"  # 전체 사용 수 스케치 이름 (나머지는 포지션 카테고리 이름)
+
+class SpaceSaving:
+    """
+    가중치 Space-Saving heavy-hitter 스케치 (항목 -> 사용 수 추정)
+    - 최대 capacity개의 항목만 추적하고, 가득 차면 추정값이 가장 작은 항목을 새 항목으로 교체
+      (새 항목의 추정값 = 밀려난 항목의 추정값 + 가중치, 오차 = 밀려난 항목의 추정값)
+    - 추적 중인 항목의 실제 값은 [추정값 - 오차, 추정값] 안에 있고, 오차는 total / capacity 이하
+    - 추적하지 않는 항목의 실제 값은 min_count() 이하
+    """
+    def __init__(self, capacity=SKETCH_CAPACITY):
+        self.capacity = capacity
+        self.total = 0
+        self._counts = {}  # 항목 -> [추정값, 오차]
+        self._heap = []  # (추정값, 항목), 값이 바뀐 항목의 예전 값은 꺼낼 때 건너뜀
+
+    def __len__(self):
+        return len(self._counts)
+
+    def _pop_stale(self):
+        heap = self._heap
+        while heap and self._counts.get(heap[0][1], (None,))[0] != heap[0][0]:
+            heapq.heappop(heap)
+
+    def min_count(self):
+        # 추적하지 않는 항목의 최대 가능 값
+        if len(self._counts) < self.capacity:
+            return 0
+        self._pop_stale()
+        return self._heap[0][0]
+
+    def update(self, items, weights):
+        # items/weights: 새로 들어온 항목과 사용 수 (한 배치 안에서는 사용 수가 큰 항목부터 반영)
+        weights = np.asarray(weights, dtype=np.int64)
+        order = np.argsort(-weights, kind="stable")
+        for item, weight in zip(np.asarray(items)[order].tolist(), weights[order].tolist()):
+            if weight <= 0:
+                continue
+            self.total += weight
+            entry = self._counts.get(item)
+            if entry is not None:
+                entry[0] += weight
+            elif len(self._counts) < self.capacity:
+                entry = self._counts[item] = [weight, 0]
+            else:
+                self._pop_stale()
+                floor, evicted = heapq.heappop(self._heap)
+                del self._counts[evicted]
+                entry = self._counts[item] = [floor + weight, floor]
+            heapq.heappush(self._heap, (entry[0], item))
+        if len(self._heap) > 4 * self.capacity:  # 예전 값이 쌓이면 다시 만듦
+            self._heap = [(count, item) for item, (count, _) in self._counts.items()]
+            heapq.heapify(self._heap)
+
+    def top(self, k) -> pd.DataFrame:
+        """
+        추정값 상위 k개 (같으면 항목 오름차순): item, count(추정값), error(최대 과대 추정),
+        guaranteed(실제 값의 하한이 k+1번째 항목과 추적하지 않는 항목의 상한 이상 -> 실제 top-k임이 보장됨)
+        """
+        ranked = heapq.nsmallest(k + 1, self._counts.items(), key=lambda entry: (-entry[1][0], entry[0]))
+        threshold = max(ranked[k][1][0] if len(ranked) > k else 0, self.min_count())
+        top = ranked[:k]
+        return pd.DataFrame({
+            "item": [item for item, _ in top],
+            "count": np.array([count for _, (count, _) in top], dtype=np.int64),
+            "error": np.array([error for _, (_, error) in top], dtype=np.int64),
+            "guaranteed": np.array([count - error >= threshold for _, (count, error) in top], dtype=bool),
+        })
+
+
+class IncrementalAggregates:
+    """
+    match_info/ranking_info에 새로 적재된 행(created_at > 워터마크)만 집계해 누적 집계에 더함
+    - usage: (spid, 포지션)별 사용 수, spgrade 합계/개수 -> 포지션별 평균 강화 등급
+    - sketches: 전체/포지션 카테고리별 사용 수 Space-Saving 스케치 -> 인기 선수 TOP N (오차 한계 포함)
+    - division_sketches: 등급별 사용 수 스케치 (등급은 행을 더할 때의 최신 랭킹 스냅샷 기준)
+    - team_worth: 등급별 team_worth 합계/개수 -> 등급별 평균 팀 가치
+    평균은 합계와 개수로 보관하므로 새 행의 합계/개수를 그대로 더하면 된다.
+    갱신 비용은 전체 이력이 아니라 새로 적재된 행 수에 비례한다.
+    갱신할 때마다 워터마크 시각의 행 수(마지막 적재)를, reconcile_interval마다 워터마크 이하 전체 행 수를
+    누적한 값과 비교해 다르면(재적재, 늦게 들어온 행) 처음부터 다시 집계한다.
+    created_at이 NULL인 행은 집계하지 않는다.
+    track_team_worth=False면 ranking_info 증분(team_worth)은 조회하지 않는다. (최신 스냅샷만 보는 경우)
+    웨어하우스 조회는 잠금 밖에서 하고, 누적 집계에 더하는 동안만 잠가 읽는 쪽이 조회를 기다리지 않게 한다.
+    """
+    def __init__(self, fetch, sketch_capacity=SKETCH_CAPACITY, reconcile_interval=WATERMARK_RECONCILE_INTERVAL,
+                 track_team_worth=True):
+        # fetch(query, params) -> DataFrame
+        self._fetch = fetch
+        self.sketch_capacity = sketch_capacity
+        self.reconcile_interval = reconcile_interval
+        self.track_team_worth = track_team_worth
+        self._lock = threading.Lock()  # 누적 집계/스케치 (읽기, 더하기)
+        self._refresh_lock = threading.Lock()  # 갱신은 한 번에 하나씩 (같은 증분을 두 번 더하지 않도록)
+        self._reset()
+
+    def _reset(self):
+        self.version = None
+        self.match_watermark = MIN_WATERMARK
+        self.ranking_watermark = MIN_WATERMARK
+        self.match_rows = 0
+        self.ranking_rows = 0
+        self.match_watermark_rows = 0  # 워터마크 시각에 적재된 행 수
+        self.ranking_watermark_rows = 0
+        self.reconciled_at = time.time()  # 전체 행 수를 마지막으로 맞춰 본 시각 (처음부터 집계하면 그 시각)
+        self.usage = pd.DataFrame(
+            {"num": [], "spgrade_sum": [], "spgrade_count": []},
+            index=pd.MultiIndex.from_arrays([[], []], names=["spid", "position"]),
+            dtype=np.float64
+        )
+        self.team_worth = pd.DataFrame(
+            {"worth_sum": [], "worth_count": []},
+            index=pd.Index([], name="division_id"),
+            dtype=np.float64
+        )
+        self.sketches = {name: SpaceSaving(self.sketch_capacity) for name in [SKETCH_ALL, *POSITION_CATEGORIES]}
+        self.division_sketches = {}
+        self._derived = {}
+
+    def refresh(self, version=None) -> dict:
+        """
+        version: 데이터 버전 (이전 갱신과 같으면 아무것도 하지 않음)
+        반환값: {"full": 처음부터 다시 집계했는지, "match_rows"/"ranking_rows": 새로 더한 행 수}
+        """
+        with self._refresh_lock:
+            if version is not None and version == self.version:
+                return {"full": False, "match_rows": 0, "ranking_rows": 0}
+
+            # 조회 (잠금 밖, 워터마크는 갱신 중에만 바뀌므로 _refresh_lock 안에서는 그대로)
+            match_watermark, ranking_watermark = self.match_watermark, self.ranking_watermark
+            full = self.match_rows == 0 and self.ranking_rows == 0
+            reconcile = False
+            if not full:
+                reconcile = time.time() - self.reconciled_at >= self.reconcile_interval
+                if reconcile:
+                    query, expected = query_watermark_rows, (self.match_rows, self.ranking_rows)
+                else:
+                    query, expected = query_watermark_load_rows, (self.match_watermark_rows, self.ranking_watermark_rows)
+                counts = self._fetch(query, (match_watermark, ranking_watermark))
+                if (int(counts.loc[0, "match_rows"]), int(counts.loc[0, "ranking_rows"])) != expected:
+                    full = True
+                    match_watermark = ranking_watermark = MIN_WATERMARK
+
+            df_match = self._fetch(query_match_delta, (match_watermark, match_watermark))
+            df_division = None
+            if not df_match.empty:
+                new_watermark = max(match_watermark, pd.Timestamp(df_match["last_created_at"].max()).to_pydatetime())
+                df_division = self._fetch(query_division_usage_delta, (match_watermark, new_watermark))
+            df_ranking = None
+            if self.track_team_worth:
+                df_ranking = self._fetch(query_ranking_delta, (ranking_watermark, ranking_watermark))
+
+            # 더하기 (잠금 안)
+            with self._lock:
+                if full:
+                    self._reset()
+                elif reconcile:
+                    self.reconciled_at = time.time()
+                match_rows = self._merge_match(df_match)
+                if df_division is not None:
+                    self._merge_division(df_division)
+                ranking_rows = self._merge_ranking(df_ranking) if df_ranking is not None else 0
+                self.version = version
+                self._derived = {}
+            return {"full": full, "match_rows": match_rows, "ranking_rows": ranking_rows}
+
+    def _merge_match(self, df) -> int:
+        if df.empty:
+            return 0
+        delta = df.set_index(["spid", "position"])[["num", "spgrade_sum", "spgrade_count"]].astype(np.float64)
+        delta = delta.groupby(level=["spid", "position"], dropna=False).sum()
+        self.usage = self.usage.add(delta, fill_value=0)
+        self.match_watermark = max(self.match_watermark, pd.Timestamp(df["last_created_at"].max()).to_pydatetime())
+        self.match_watermark_rows = int(df["last_load_rows"].astype(np.int64).sum())
+        self.match_rows += int(delta["num"].sum())
+
+        num = delta["num"].astype(np.int64)
+        spids = num.index.get_level_values("spid")
+        by_spid = num.groupby(spids).sum()
+        self.sketches[SKETCH_ALL].update(by_spid.index, by_spid.to_numpy())
+        categories = position_category(num.index.get_level_values("position"))
+        by_category = num.groupby([categories, spids]).sum()
+        for category, counts in by_category.groupby(level=0):
+            self.sketches[category].update(counts.index.get_level_values(1), counts.to_numpy())
+        return int(delta["num"].sum())
+
+    def _merge_division(self, df):
+        for division_id, rows in df.groupby("division_id"):
+            sketch = self.division_sketches.setdefault(int(division_id), SpaceSaving(self.sketch_capacity))
+            sketch.update(rows["spid"].astype(np.int64), rows["num"].astype(np.int64))
+
+    def _merge_ranking(self, df) -> int:
+        if df.empty:
+            return 0
+        delta = df.set_index("division_id")[["worth_sum", "worth_count"]].astype(np.float64)
+        self.team_worth = self.team_worth.add(delta.groupby(level="division_id").sum(), fill_value=0)
+        self.ranking_watermark = max(self.ranking_watermark, pd.Timestamp(df["last_created_at"].max()).to_pydatetime())
+        self.ranking_watermark_rows = int(df["last_load_rows"].astype(np.int64).sum())
+        self.ranking_rows += int(df["num"].astype(np.int64).sum())
+        return int(df["num"].astype(np.int64).sum())
+
+    def _memo(self, key, compute):
+        # refresh()가 누적 집계와 스케치를 바꾸는 중에는 읽지 않도록 같은 잠금 안에서 계산
+        with self._lock:
+            if key not in self._derived:
+                self._derived[key] = compute()
+            return self._derived[key]
+
+    def _usage_in(self, category):
+        usage = self.usage
+        if category is None:
+            return usage
+        return usage[position_category(usage.index.get_level_values("position")) == category]
+
+    def top_players(self, limit=10, category=None, division_id=None) -> pd.DataFrame:
+        """
+        스케치에서 사용 수 상위 limit명: spid, num(추정 사용 수), error(최대 과대 추정), guaranteed
+        category: 포지션 카테고리(gk/df/mf/fw/sub), division_id: 등급 (둘 다 없으면 전체)
+        """
+        def compute():
+            if division_id is not None:
+                sketch = self.division_sketches.get(division_id, SpaceSaving(self.sketch_capacity))
+            else:
+                sketch = self.sketches[category or SKETCH_ALL]
+            return sketch.top(limit).rename(columns={"item": "spid", "count": "num"})
+        return self._memo(("top_players", limit, category, division_id), compute)
+
+    def division_ids(self) -> list:
+        with self._lock:
+            return sorted(self.division_sketches)
+
+    def check_sketches(self, limit=10) -> pd.DataFrame:
+        """
+        전체/포지션 스케치의 top-limit을 워터마크 이하의 정확한 사용 수(query_usage_exact)와 비교
+        반환값: 스케치별 total, tracked, max_error(보고한 항목 중), within_bounds(정확한 값이 [추정값 - 오차, 추정값] 안),
+                top_k(보고한 항목이 모두 실제 top-limit 사용 수 이상), guaranteed(보장된 항목 수)
+        등급별 스케치는 더한 시점의 등급을 쓰므로 쿼리로 다시 계산할 수 없어 제외
+        """
+        with self._lock:
+            # 같은 워터마크의 스케치 상태를 잡아 두고 조회는 잠금 밖에서
+            match_watermark = self.match_watermark
+            sketches = {name: (sketch.total, len(sketch), sketch.top(limit)) for name, sketch in self.sketches.items()}
+        exact = self._fetch(query_usage_exact, (match_watermark,))
+        categories = position_category(exact["position"])
+        rows = []
+        for name, (total, tracked, top) in sketches.items():
+            rows_in = exact if name == SKETCH_ALL else exact[categories == name]
+            counts = rows_in.groupby("spid")["num"].sum()
+            actual = top["item"].map(counts).fillna(0)
+            kth = counts.nlargest(limit).min() if len(counts) else 0
+            rows.append({
+                "sketch": name,
+                "total": total,
+                "tracked": tracked,
+                "max_error": int(top["error"].max()) if len(top) else 0,
+                "within_bounds": bool(((actual >= top["count"] - top["error"]) & (actual <= top["count"])).all()),
+                "top_k": bool((actual >= kth).all() and len(top) == min(limit, len(counts))),
+                "guaranteed": int(top["guaranteed"].sum()),
+            })
+        return pd.DataFrame(rows)
+
+    def position_usage(self, category=None) -> pd.DataFrame:
+        # 포지션별 사용 수와 spgrade 합계/개수: position(NULL 포함), num, spgrade_sum, spgrade_count
+        # category: 포지션 카테고리 (목록에 없는 포지션은 DEFAULT_POSITION_CATEGORY, 없으면 전체)
+        def compute():
+            return self._usage_in(category).groupby(level="position", dropna=False).sum().reset_index()
+        return self._memo(("position_usage", category), compute)
+
+    def division_team_worth(self) -> pd.DataFrame:
+        # 등급별 평균 팀 가치: division_id, avg_team_worth
+        def compute():
+            team_worth = self.team_worth
+            avg = team_worth["worth_sum"] / team_worth["worth_count"].where(team_worth["worth_count"] > 0)
+            return avg.rename("avg_team_worth").reset_index()
+        return self._memo(("division_team_worth",), compute)
+
+##########################################################################
+# 선수 후기 감정분석 요약 (spid별 긍정/부정 후기 수와 판정)
+SENTIMENT_POSITIVE = "긍정"
+SENTIMENT_NEGATIVE = "부정"
+SENTIMENT_NONE = "후기 없음"
+
+# spid별 긍정(prediction = 1)/부정(prediction = 0) 후기 수
+query_sentiment_summary = """
+SELECT
+    spid,
+    COUNT(CASE WHEN prediction = 1 THEN 1 END) AS positive,
+    COUNT(CASE WHEN prediction = 0 THEN 1 END) AS negative
+FROM analytics.player_review_info
+GROUP BY spid;
+"""
+
+class SentimentSummary:
+    """
+    query_sentiment_summary 결과로 만든 spid별 감정분석 요약
+    spid를 정렬한 배열에서 이분 탐색하므로 여러 spid를 한 번에 조회할 수 있다.
+    판정은 기존 쿼리와 같다: 긍정 후기가 없으면 '후기 없음', 긍정 >= 부정이면 '긍정', 아니면 '부정'
+    (후기가 없는 spid는 긍정/부정 0개)
+    """
+    def __init__(self, df_summary):
+        order = np.argsort(df_summary["spid"].to_numpy(dtype=np.int64), kind="stable")
+        self.spids = df_summary["spid"].to_numpy(dtype=np.int64)[order]
+        self.positive = df_summary["positive"].to_numpy(dtype=np.int64)[order]
+        self.negative = df_summary["negative"].to_numpy(dtype=np.int64)[order]
+
+    def __len__(self):
+        return len(self.spids)
+
+    def counts(self, spids):
+        # 반환값: (긍정 후기 수 배열, 부정 후기 수 배열), spids와 같은 순서
+        spids = np.asarray(spids, dtype=np.int64)
+        if not len(self.spids):
+            return np.zeros(len(spids), dtype=np.int64), np.zeros(len(spids), dtype=np.int64)
+        index = np.minimum(np.searchsorted(self.spids, spids), len(self.spids) - 1)
+        found = self.spids[index] == spids
+        return np.where(found, self.positive[index], 0), np.where(found, self.negative[index], 0)
+
+    def verdicts(self, spids) -> np.ndarray:
+        # 반환값: spids 순서대로 '긍정'/'부정'/'후기 없음'
+        positive, negative = self.counts(spids)
+        return np.select(
+            [positive == 0, positive >= negative],
+            [SENTIMENT_NONE, SENTIMENT_POSITIVE],
+            default=SENTIMENT_NEGATIVE
+        ).astype(object)
+
+##########################################################################
+# spid별 이미지 존재 여부 인덱스 (CACHE_DIR/IMAGE_INDEX_FILE, 대시보드와 benchmark_pages.py가 함께 사용)
+IMAGE_INDEX_FILE = "image_index.sqlite3"
+IMAGE_POSITIVE_TTL = 7 * 24 * 60 * 60  # 이미지가 있는 spid 재확인 주기(초)
+IMAGE_NEGATIVE_TTL = 24 * 60 * 60  # 이미지가 없는 spid 재확인 주기(초)
+
+class ImageAvailabilityIndex:
+    """
+    spid -> (이미지 존재 여부, 마지막 확인 시각)을 SQLite 파일에 저장
+    - 확인한 지 TTL이 지난 항목은 모르는 spid로 취급해 다시 확인
+    - 이미지가 없는 spid도 저장해(negative cache) 같은 요청을 반복하지 않음
+    """
+    def __init__(self, path, positive_ttl=IMAGE_POSITIVE_TTL, negative_ttl=IMAGE_NEGATIVE_TTL):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS image_availability (
+                    spid INTEGER PRIMARY KEY,
+                    available INTEGER NOT NULL,
+                    checked_at REAL NOT NULL
+                )
+            """)
+
+    def seed(self, spids):
+        # player_image_info에 있는 spid를 한 번에 등록 (이미 확인한 spid는 그대로 둠)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO image_availability (spid, available, checked_at) VALUES (?, 1, ?)",
+                [(int(spid), now) for spid in spids]
+            )
+
+    def lookup(self, spids) -> dict:
+        # 반환값: {spid: True/False}, 모르거나 TTL이 지난 spid는 None
+        spids = list(dict.fromkeys(spids))
+        result = {spid: None for spid in spids}
+        keys = {int(spid): spid for spid in spids}
+        now = time.time()
+        key_list = list(keys)
+        with self._lock:
+            for i in range(0, len(key_list), 500):
+                chunk = key_list[i : i + 500]
+                rows = self._conn.execute(
+                    f"SELECT spid, available, checked_at FROM image_availability WHERE spid IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                for spid, available, checked_at in rows:
+                    ttl = self.positive_ttl if available else self.negative_ttl
+                    if now - checked_at < ttl:
+                        result[keys[spid]] = bool(available)
+        return result
+
+    def store(self, results: dict):
+        # results: {spid: 존재 여부}
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO image_availability (spid, available, checked_at) VALUES (?, ?, ?)",
+                [(int(spid), int(available), now) for spid, available in results.items()]
+            )
+
+##########################################################################
+# 이미지 썸네일 캐시 (원본 이미지를 한 번만 받아 표시 크기로 줄여 디스크에 저장)
+THUMBNAIL_MAX_AGE = 7 * 24 * 60 * 60  # 원본을 다시 받는 주기(초)
+
+def make_thumbnail(data, width=None) -> bytes:
+    # width보다 넓은 이미지만 비율을 유지해 줄이고 PNG로 저장 (투명 배경 유지)
+    with Image.open(io.BytesIO(data)) as image:
+        image = image.convert("RGBA")
+        if width and image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+        out = io.BytesIO()
+        image.save(out, format="PNG", optimize=True)
+    return out.getvalue()
+
+class ThumbnailCache:
+    """
+    (원본 URL, 너비)로 찾는 썸네일 디스크 캐시
+    - 썸네일 파일은 내용의 sha256을 이름으로 저장 -> 같은 이미지(예: 기본 이미지)는 한 번만 저장
+    - (URL, 너비) -> sha256은 SQLite에 기록해 프로세스를 다시 시작해도 원본을 다시 받지 않음
+    - 같은 썸네일을 여러 스레드가 동시에 요청하면 원본은 한 번만 받음
+    """
+    def __init__(self, cache_dir, fetch, max_age=THUMBNAIL_MAX_AGE):
+        # fetch(url) -> 원본 이미지 bytes (실패하면 예외)
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self._fetch = fetch
+        os.makedirs(cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(cache_dir, "thumbnails.sqlite3"), check_same_thread=False)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS thumbnails (
+                    source_url TEXT NOT NULL,
+                    width INTEGER NOT NULL,
+                    digest TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    PRIMARY KEY (source_url, width)
+                )
+            """)
+        self._lock = threading.Lock()
+        self._pending = {}  # (URL, 너비) -> 원본을 받는 동안 잡는 Lock
+
+    def path(self, digest):
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.png")
+
+    def _lookup(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT digest, fetched_at FROM thumbnails WHERE source_url = ? AND width = ?", key
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.max_age:
+            return None
+        try:
+            with open(self.path(row[0]), "rb") as f:
+                return row[0], f.read()
+        except OSError:  # 파일이 지워졌으면 다시 받음
+            return None
+
+    def _store(self, key, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO thumbnails (source_url, width, digest, fetched_at) VALUES (?, ?, ?, ?)",
+                (*key, digest, time.time())
+            )
+        return digest
+
+    def get(self, url, width=None):
+        """
+        url: 원본 이미지 URL, width: 썸네일 최대 너비 (None이면 원본 크기)
+        반환값: (sha256, PNG bytes, 캐시 적중 여부)
+        """
+        key = (url, width or 0)
+        cached = self._lookup(key)
+        if cached is not None:
+            return (*cached, True)
+
+        with self._lock:
+            pending = self._pending.setdefault(key, threading.Lock())
+        try:
+            with pending:
+                cached = self._lookup(key)  # 기다리는 동안 다른 스레드가 저장했으면 그대로 사용
+                if cached is not None:
+                    return (*cached, True)
+                data = make_thumbnail(self._fetch(url), width)
+                return self._store(key, data), data, False
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+##########################################################################
+# 프로세스 간 공유 쿼리 결과 캐시 (같은 서버의 Streamlit 프로세스들이 결과를 한 번만 조회/보관)
+RESULT_CACHE_MAX_BYTES = 2 * 1024 ** 3  # 넘으면 오래 쓰지 않은 결과 파일부터 삭제
+RESULT_CACHE_MAX_TABLES = 500  # 프로세스마다 열어 두는 결과 수 (메모리 맵이라 힙을 거의 쓰지 않음)
+RESULT_CACHE_LOCK_TIMEOUT = 120  # 다른 쪽이 같은 결과를 조회하는 동안 기다리는 최대 시간(초)
+RESULT_CACHE_LOCK_POLL = 0.05  # 잠금을 다시 시도하는 간격(초)
+RESULT_CACHE_PRUNE_INTERVAL = 60  # 프로세스마다 결과 파일 크기를 확인하는 최소 간격(초)
+RESULT_CACHE_STALE_LOCK_AGE = 60 * 60  # 이보다 오래된 잠금 파일은 비정상 종료로 남은 것으로 보고 삭제
+
+class SharedResultCache:
+    """
+    (쿼리, 바인딩 값, 데이터 버전)으로 찾는 쿼리 결과 디스크 캐시
+    - 결과는 Arrow IPC 파일로 저장하고 memory map으로 읽음
+      -> 모든 프로세스가 OS 페이지 캐시의 사본 하나를 복사 없이 DataFrame으로 사용 (수정하면 pandas가 복사)
+    - 없는 결과를 여러 프로세스/스레드가 동시에 요청하면 키별 파일 잠금(flock)을 먼저 잡은 쪽만 쿼리를 실행하고
+      나머지는 기다렸다가 저장된 파일을 읽음 (lock_timeout이 지나면 기다리지 않고 직접 조회)
+    - 임시 파일에 쓴 뒤 교체하므로 읽는 쪽은 항상 완성된 파일만 봄 (삭제된 파일도 열어 둔 맵은 계속 유효)
+    """
+    def __init__(self, cache_dir, max_bytes=RESULT_CACHE_MAX_BYTES, max_tables=RESULT_CACHE_MAX_TABLES,
+                 lock_timeout=RESULT_CACHE_LOCK_TIMEOUT, prune_interval=RESULT_CACHE_PRUNE_INTERVAL):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_tables = max_tables
+        self.lock_timeout = lock_timeout
+        self.prune_interval = prune_interval
+        os.makedirs(os.path.join(cache_dir, "locks"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._tables = OrderedDict()  # 키 -> 메모리 맵한 pa.Table (오래 안 쓴 순)
+        self._last_prune = None  # 마지막으로 크기를 확인한 시각 (time.monotonic)
+
+    @staticmethod
+    def key(query, params, data_version) -> str:
+        return hashlib.sha256(repr((query, params, data_version)).encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.arrow")
+
+    def _flock(self, f, deadline) -> bool:
+        # deadline(time.monotonic)까지 잠금을 시도, 반환값: 잡았는지
+        while True:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(RESULT_CACHE_LOCK_POLL)
+
+    @contextmanager
+    def _write_lock(self, key):
+        """
+        키별 잠금 파일 locks/<key>.lock을 잡고, 결과를 저장한 뒤 삭제
+        yield 값: 잠금을 잡았으면 True, lock_timeout 안에 잡지 못했으면 False
+        """
+        path = os.path.join(self.cache_dir, "locks", f"{key}.lock")
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            with open(path, "a") as f:
+                if not self._flock(f, deadline):
+                    yield False
+                    return
+                try:
+                    current = os.stat(path).st_ino == os.fstat(f.fileno()).st_ino
+                except FileNotFoundError:
+                    current = False
+                if current:
+                    try:
+                        yield True
+                    finally:
+                        os.remove(path)  # 잠금을 잡은 채로 지워야 기다리던 쪽이 새 파일로 다시 시도함
+                    return
+            # 기다리는 동안 앞서 잡았던 쪽이 파일을 지웠으면 새 잠금 파일로 다시 시도
+
+    def _open(self, key):
+        # 반환값: 메모리 맵한 pa.Table (저장된 결과가 없으면 None)
+        with self._lock:
+            table = self._tables.get(key)
+            if table is not None:
+                self._tables.move_to_end(key)
+                return table
+        path = self.path(key)
+        try:
+            with pa.memory_map(path) as source:  # 파일을 닫아도 테이블이 맵을 잡고 있음
+                table = pa.ipc.open_file(source).read_all()
+            os.utime(path)  # 정리할 때 최근에 쓴 결과로 취급
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self._tables[key] = table
+            while len(self._tables) > self.max_tables:
+                self._tables.popitem(last=False)
+        return table
+
+    def _store(self, key, df):
+        table = pa.Table.from_pandas(df)
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_path, path)
+
+        now = time.monotonic()
+        with self._lock:
+            if self._last_prune is not None and now - self._last_prune < self.prune_interval:
+                return
+            self._last_prune = now
+        self._prune()
+
+    def _prune(self):
+        # 전체 크기가 max_bytes를 넘으면 가장 오래 쓰지 않은 파일부터 삭제
+        files = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_dir():
+                continue
+            if entry.name == "locks":
+                self._prune_locks(entry.path)
+                continue
+            for sub in os.scandir(entry.path):
+                if not sub.name.endswith(".arrow"):
+                    continue
+                try:
+                    stat = sub.stat()
+                except FileNotFoundError:  # 다른 프로세스가 먼저 삭제
+                    continue
+                files.append((stat.st_mtime, stat.st_size, sub.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def _prune_locks(self, lock_dir):
+        # 프로세스가 잠금을 잡은 채 종료되어 남은 잠금 파일 삭제 (기다리던 쪽은 새 파일로 다시 시도)
+        now = time.time()
+        for entry in os.scandir(lock_dir):
+            try:
+                if now - entry.stat().st_mtime > RESULT_CACHE_STALE_LOCK_AGE:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def get(self, key, fetch):
+        """
+        key: SharedResultCache.key()의 결과
+        fetch(): 저장된 결과가 없을 때 DataFrame을 만드는 함수 (실패하면 예외를 그대로 전달)
+        반환값: (DataFrame, 캐시 적중 여부)
+        """
+        table = self._open(key)
+        if table is None:
+            with self._write_lock(key):  # 잠금을 잡지 못하고 시간이 지나도 직접 조회해서 돌려줌
+                table = self._open(key)  # 기다리는 동안 다른 프로세스가 저장했으면 그대로 사용
+                if table is None:
+                    df = fetch()
+                    try:
+                        self._store(key, df)
+                    except (pa.ArrowException, OSError):  # Arrow로 바꿀 수 없는 결과나 디스크 오류는 저장만 건너뜀
+                        pass
+                    return df, False
+        return table.to_pandas(split_blocks=True), True
+
+##########################################################################
+# 차원 테이블 (시즌/등급/포지션/선수 정보): 작고 자주 바뀌지 않으므로 메모리에 두고 id로 이름을 찾음
+# 자주 실행하는 쿼리는 id별 집계만 조회하고, 이름/시즌 아이콘/등급 이름은 여기서 붙인다.
+dimension_queries = {
+    "seasons": "SELECT season_id, name, image_url FROM analytics.season_info;",
+    "divisions": "SELECT division_id, division_name FROM analytics.division_info;",
+    "positions": "SELECT spposition, name FROM analytics.position_info;",
+    "players": "SELECT spid, name FROM analytics.player_info;",
+}
+
+# spid의 앞 3자리 = 시즌 id (쿼리의 LEFT(spid, 3))
+def spid_season_id(spids) -> np.ndarray:
+    spids = pd.Series(spids, dtype=np.int64)
+    return spids.astype(str).str[:3].astype(np.int64).to_numpy()
+
+def lookup_series(df, key, value) -> pd.Series:
+    # key -> value Series (키가 중복되면 처음 값)
+    series = pd.Series(df[value].to_numpy(), index=pd.Index(df[key].to_numpy(dtype=np.int64)))
+    return series[~series.index.duplicated()]
+
+class Dimensions:
+    """
+    dimension_queries 결과로 만든 id -> 이름 조회 테이블
+    - attach_players: spid -> 선수 이름, 시즌 id/이름/아이콘 (player_info JOIN, season_info LEFT JOIN과 같음)
+    - attach_divisions: division_id -> 등급 이름 (division_info JOIN과 같음)
+    - position_names: 포지션 id(spposition) -> 세부 포지션 이름
+    - season_image_hosts: 시즌 아이콘 주소의 호스트 집합 (이미지 서버가 받아 올 수 있는 호스트)
+    조회는 모두 배열 단위(Series.map)로 한 번에 처리하며 입력 행의 순서를 유지한다.
+    """
+    def __init__(self, seasons, divisions, positions, players):
+        self.season_names = lookup_series(seasons, "season_id", "name")
+        self.season_images = lookup_series(seasons, "season_id", "image_url")
+        self.season_image_hosts = frozenset(
+            urlsplit(url).hostname for url in self.season_images if isinstance(url, str) and urlsplit(url).hostname
+        )
+        self.division_names = lookup_series(divisions, "division_id", "division_name")
+        self.position_names = lookup_series(positions, "spposition", "name")
+        self.player_names = lookup_series(players, "spid", "name")
+
+    def attach_players(self, df, spid_column="spid", name_column="name") -> pd.DataFrame:
+        """
+        df에 선수 이름(name_column), season_id(없을 때만), season_name, season_img_url을 붙인 DataFrame
+        player_info에 없는 spid의 행은 제외 (시즌 정보가 없으면 NaN)
+        """
+        names = df[spid_column].astype(np.int64).map(self.player_names).to_numpy()
+        found = pd.notna(names)
+        df = df[found].copy()
+        df[name_column] = names[found]
+        season_ids = pd.Series(spid_season_id(df[spid_column]))
+        if "season_id" not in df.columns:
+            df["season_id"] = season_ids.to_numpy()
+        df["season_name"] = season_ids.map(self.season_names).to_numpy()
+        df["season_img_url"] = season_ids.map(self.season_images).to_numpy()
+        return df
+
+    def attach_divisions(self, df, division_column="division_id", name_column="등급") -> pd.DataFrame:
+        # df에 등급 이름(name_column)을 붙인 DataFrame (division_info에 없는 등급의 행은 제외)
+        names = df[division_column].astype(np.int64).map(self.division_names).to_numpy()
+        found = pd.notna(names)
+        df = df[found].copy()
+        df[name_column] = names[found]
+        return df
@@ -3,45 +3,416 @@ import plotly.express as px
 import pandas as pd
 import redshift_connector
 import requests
+import json
+import os
+import queue
+import re
+import threading
+import time
+from dataclasses import dataclass
+from contextlib import contextmanager
+from requests.adapters import HTTPAdapter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urljoin, urlsplit
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from FConline_data import (
+    fetch_columnar, position_category, position_category_sql, position_filter_sql, DEFAULT_POSITION_CATEGORY,
+    open_snapshot, to_duckdb_sql, DEFAULT_SNAPSHOT_DIR, Telemetry, NicknameIndex,
+    IncrementalAggregates, query_match_delta, query_ranking_delta,
+    SentimentSummary, query_sentiment_summary, ThumbnailCache, THUMBNAIL_MAX_AGE,
+    Dimensions, dimension_queries, latest_snapshot_sql, SharedResultCache,
+    ImageAvailabilityIndex, IMAGE_INDEX_FILE
+)
 
-# secrets.toml에서 Redshift 연결 정보 불러오기
-REDSHIFT_HOST = st.secrets["redshift"]["host"]
-REDSHIFT_PORT = st.secrets["redshift"]["port"]
-REDSHIFT_DATABASE = st.secrets["redshift"]["database"]
-REDSHIFT_USER = st.secrets["redshift"]["user"]
-REDSHIFT_PASSWORD = st.secrets["redshift"]["password"]
+# 데이터 조회 방식 (secrets.toml의 [serving])
+# - "redshift": Redshift analytics 스키마를 직접 조회 (기본값)
+# - "duckdb": snapshot_sync.py로 저장한 로컬 Parquet 스냅샷을 DuckDB로 조회
+SERVING_MODE = st.secrets.get("serving", {}).get("mode", "redshift")
+SNAPSHOT_DIR = st.secrets.get("serving", {}).get("snapshot_dir", DEFAULT_SNAPSHOT_DIR)
+# 이미지 인덱스 등 로컬 캐시 파일을 저장하는 폴더
+CACHE_DIR = st.secrets.get("serving", {}).get("cache_dir", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+# 서버 시작 후 고정 페이지 캐시를 미리 채울지, 준비 상태를 알려 주는 주소 (포트가 0이면 사용 안 함)
+# readiness_port를 지정하지 않으면 이 프로세스의 Streamlit 포트 + READINESS_PORT_OFFSET
+# -> 같은 호스트의 레플리카마다 포트가 달라 각 /ready는 자기 프로세스의 상태만 알림
+WARMUP_ENABLED = st.secrets.get("serving", {}).get("warmup", True)
+READINESS_PORT_OFFSET = 1000
+READINESS_PORT = int(st.secrets.get("serving", {}).get("readiness_port", st.get_option("server.port") + READINESS_PORT_OFFSET))
+READINESS_HOST = st.secrets.get("serving", {}).get("readiness_host", "127.0.0.1")
+# 사용량/평균 집계 갱신 방식
+# - "full": 데이터 버전이 바뀌면 전체 이력을 다시 집계 (기본값)
+# - "incremental": 새로 적재된 행(created_at > 워터마크)만 집계해 누적 집계에 더함
+REFRESH_MODE = st.secrets.get("serving", {}).get("refresh", "full")
+# 이미지 서버: 브라우저가 접근하는 주소(비어 있으면 CDN 이미지를 직접 링크)와 이 프로세스가 여는 포트
+# 예) image_proxy_url = "http://localhost:8503" 또는 리버스 프록시 뒤의 "https://<도메인>/img"
+IMAGE_PROXY_URL = st.secrets.get("serving", {}).get("image_proxy_url", "")
+IMAGE_PROXY_PORT = int(st.secrets.get("serving", {}).get("image_port", 8503))
+# ranking_info 스냅샷 범위
+# - "latest": 가장 최근에 적재된 스냅샷만 조회 (기본값, 이력이 쌓여도 조회량이 일정)
+# - "all": 적재된 모든 스냅샷을 조회
+RANKING_SNAPSHOT = st.secrets.get("serving", {}).get("ranking_snapshot", "latest")
+# 쿼리 결과 캐시
+# - "shared": CACHE_DIR/results의 Arrow 파일을 같은 서버의 모든 프로세스가 공유 (기본값)
+# - "memory": 프로세스마다 st.cache_data에 보관
+RESULT_CACHE = st.secrets.get("serving", {}).get("result_cache", "shared")
+
+# secrets.toml에서 Redshift 연결 정보 불러오기 (duckdb 모드에서는 없어도 됨)
+redshift_secrets = st.secrets.get("redshift", {})
+REDSHIFT_HOST = redshift_secrets.get("host")
+REDSHIFT_PORT = redshift_secrets.get("port")
+REDSHIFT_DATABASE = redshift_secrets.get("database")
+REDSHIFT_USER = redshift_secrets.get("user")
+REDSHIFT_PASSWORD = redshift_secrets.get("password")
+
+# 쿼리에서 조인/필터에 쓰는 포지션 카테고리 (포지션 id -> gk/df/mf/fw/sub)
+position_category_cte = position_category_sql()
 
 ###################################################
-@st.cache_resource
+REDSHIFT_POOL_SIZE = 8  # 동시에 열어 두는 최대 연결 수
+REDSHIFT_CHECKOUT_TIMEOUT = 30  # 빈 연결을 기다리는 최대 시간(초)
+REDSHIFT_HEALTH_CHECK_INTERVAL = 60  # 이 시간(초) 이상 쉬었던 연결은 빌려주기 전에 확인
+REDSHIFT_CONNECT_RETRIES = 3  # 연결 실패 시 재시도 횟수
+REDSHIFT_CONNECT_BACKOFF = 0.5  # 첫 재시도 대기 시간(초), 재시도마다 2배
+QUERY_TIMEOUT = 120  # 쿼리 1건당 최대 대기 시간(초), 서버에서도 이 시간이 지나면 쿼리를 취소
+
 def connect_to_redshift():
+    conn = redshift_connector.connect(
+        host=REDSHIFT_HOST,
+        database=REDSHIFT_DATABASE,
+        user=REDSHIFT_USER,
+        password=REDSHIFT_PASSWORD,
+        port=int(REDSHIFT_PORT)
+    )
+    conn.autocommit = True  # 조회만 하므로 트랜잭션을 열어 두지 않음
+    cursor = conn.cursor()
     try:
-        conn = redshift_connector.connect(
-            host=REDSHIFT_HOST,
-            database=REDSHIFT_DATABASE,
-            user=REDSHIFT_USER,
-            password=REDSHIFT_PASSWORD,
-            port=int(REDSHIFT_PORT)
-        )
-        return conn
+        cursor.execute(f"SET statement_timeout TO {QUERY_TIMEOUT * 1000}")
+    finally:
+        cursor.close()
+    return conn
+
+class RedshiftConnectionPool:
+    """
+    최대 size개의 Redshift 연결을 빌려주고 돌려받는 연결 풀 (스레드 안전)
+    - 오래 쉬었던 연결은 빌려주기 전에 SELECT 1로 확인하고, 끊겼으면 새로 연결
+    - 연결에 실패하면 backoff를 두고 재시도
+    - 연결 오류가 난 연결은 풀에 돌려놓지 않고 닫음
+    """
+    def __init__(self, connect, size=REDSHIFT_POOL_SIZE):
+        self._connect = connect
+        self._idle = queue.LifoQueue()  # (연결, 마지막 사용 시각)
+        self._slots = threading.BoundedSemaphore(size)
+
+    @contextmanager
+    def connection(self, timeout=REDSHIFT_CHECKOUT_TIMEOUT):
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("사용 가능한 Redshift 연결이 없습니다.")
+        conn = None
+        try:
+            conn = self._checkout()
+            yield conn
+        except (redshift_connector.InterfaceError, redshift_connector.OperationalError):
+            self._close(conn)
+            conn = None
+            raise
+        finally:
+            if conn is not None:
+                self._idle.put((conn, time.monotonic()))
+            self._slots.release()
+
+    def _checkout(self):
+        while True:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._new_connection()
+            if time.monotonic() - last_used < REDSHIFT_HEALTH_CHECK_INTERVAL or self._is_alive(conn):
+                return conn
+            self._close(conn)
+
+    def _new_connection(self):
+        delay = REDSHIFT_CONNECT_BACKOFF
+        for attempt in range(REDSHIFT_CONNECT_RETRIES + 1):
+            try:
+                return self._connect()
+            except Exception:
+                if attempt == REDSHIFT_CONNECT_RETRIES:
+                    raise
+                time.sleep(delay)
+                delay *= 2
+
+    @staticmethod
+    def _is_alive(conn):
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+            finally:
+                cursor.close()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close(conn):
+        if conn is None:
+            return
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+# 모든 세션이 공유하는 연결 풀
+@st.cache_resource
+def get_connection_pool():
+    if SERVING_MODE == "duckdb":
+        # 스냅샷 DB 하나를 열고, 연결마다 cursor()로 독립된 DuckDB 연결을 만듦
+        snapshot = open_snapshot(SNAPSHOT_DIR)
+        return RedshiftConnectionPool(snapshot.cursor)
+    return RedshiftConnectionPool(connect_to_redshift)
+        
+######################################################
+# 쿼리/이미지 확인 텔레메트리 (프로세스 하나의 모든 세션이 공유, admin 페이지에서 확인)
+@st.cache_resource
+def get_telemetry():
+    return Telemetry()
+
+# 현재 스레드에서 캐시 대신 실제로 쿼리를 실행했는지 (캐시 적중 판별용)
+query_thread_state = threading.local()
+
+######################################################
+# 쿼리를 실행해 DataFrame으로 돌려주는 함수 (오류는 호출한 쪽으로 전달)
+# params가 있으면 쿼리의 %s 자리에 바인딩 (같은 쿼리 템플릿은 연결마다 prepared statement를 재사용)
+# data_version이 있으면 스냅샷 테이블은 그 버전(최신 스냅샷)의 행만 읽음
+def fetch_query(query, params=None, data_version=None):
+    query_thread_state.fetched = True
+    telemetry = get_telemetry()
+    template = telemetry.register_query(query)
+    query = restrict_to_latest_snapshot(query, data_version)
+    start = time.perf_counter()
+    try:
+        with get_connection_pool().connection() as conn:
+            if SERVING_MODE == "duckdb":
+                df = conn.execute(to_duckdb_sql(query), params).df()
+            else:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(query, params)
+                    df = fetch_columnar(cursor)
+                finally:
+                    cursor.close()
+    except Exception:
+        telemetry.record("query", template, time.perf_counter() - start, cache_hit=False, error=True)
+        raise
+    telemetry.record(
+        "query", template, time.perf_counter() - start, cache_hit=False,
+        rows=len(df), result_bytes=int(df.memory_usage(deep=True).sum())
+    )
+    return df
+
+# 캐시 없이 쿼리를 실행하는 함수
+def execute_query(query):
+    try:
+        return fetch_query(query)
     except Exception as e:
-        st.error(f"Redshift 연결 오류: {e}")
+        st.error(f"쿼리 실행 오류: {e}")
         return None
-        
+
 ######################################################
-@st.cache_data
-def run_query(query):
-    conn = connect_to_redshift()
-    if conn:
-        try:
-            cursor = conn.cursor()
-            cursor.execute(query)
-            data = cursor.fetchall()
-            columns = [desc[0] for desc in cursor.description]
-            return pd.DataFrame(data, columns=columns)
-        except Exception as e:
-            st.error(f"쿼리 실행 오류: {e}")
-            return None
-    return None
+# 데이터 버전: ETL이 테이블을 다시 적재하면 바뀌는 값 (테이블별 MAX(created_at))
+DATA_VERSION_TTL = 60  # 데이터 버전을 다시 확인하는 주기(초)
+VERSIONED_TABLES = ("ranking_info", "match_info")  # created_at으로 적재 시각을 알 수 있는 테이블
+LOAD_MARKER_TABLE = "ranking_info"  # created_at이 없는 테이블은 이 테이블의 적재 시각을 따름
+QUERY_CACHE_MAX_ENTRIES = 500  # 지난 버전의 결과는 오래된 순으로 밀려남
+
+@st.cache_data(ttl=DATA_VERSION_TTL)
+def get_data_versions() -> dict:
+    query_versions = " UNION ALL ".join(
+        f"SELECT '{table}' AS table_name, MAX(created_at) AS last_update FROM analytics.{table}"
+        for table in VERSIONED_TABLES
+    )
+    get_telemetry().register_query(query_versions, "data_versions")
+    df_versions = execute_query(query_versions)
+    if df_versions is None:
+        return {}
+    return dict(zip(df_versions["table_name"], df_versions["last_update"]))
+
+def get_query_version(query) -> tuple:
+    """
+    query: 실행할 SQL
+    반환값: 쿼리가 읽는 테이블들의 (테이블, 버전) 튜플 -> 결과 캐시 키로 사용
+    """
+    versions = get_data_versions()
+    tables = set(re.findall(r"analytics\.(\w+)", query))
+    keys = sorted({table if table in VERSIONED_TABLES else LOAD_MARKER_TABLE for table in tables})
+    return tuple((key, versions.get(key)) for key in keys)
+
+# 적재할 때마다 전체 스냅샷이 쌓이는 테이블 (최신 스냅샷의 created_at = 데이터 버전)
+LATEST_SNAPSHOT_TABLES = ("ranking_info",)
+
+def restrict_to_latest_snapshot(query, data_version):
+    """
+    query: 실행할 SQL
+    data_version: get_query_version(query)의 결과 (None이면 쿼리를 그대로 실행)
+    반환값: 스냅샷 테이블을 최신 스냅샷만 읽도록 바꾼 SQL
+    - 증분 집계의 델타 쿼리처럼 직접 created_at 범위를 지정하는 쿼리는 data_version 없이 실행
+    """
+    if RANKING_SNAPSHOT != "latest" or not data_version:
+        return query
+    versions = dict(data_version)
+    for table in LATEST_SNAPSHOT_TABLES:
+        if not pd.isna(versions.get(table)):
+            query = latest_snapshot_sql(query, table, versions[table])
+    return query
+
+# 바인딩 값을 캐시 키로 쓸 수 있고 드라이버가 처리할 수 있는 기본 타입 튜플로 변환
+def normalize_params(params):
+    if params is None:
+        return None
+    return tuple(value.item() if hasattr(value, "item") else value for value in params)
+
+@st.cache_data(max_entries=QUERY_CACHE_MAX_ENTRIES)
+def run_query_memory(query, params, data_version):
+    return fetch_query(query, params, data_version)
+
+# 여러 프로세스(레플리카)가 공유하는 결과 캐시: 같은 결과는 서버 전체에서 한 번만 조회하고 한 벌만 보관
+@st.cache_resource
+def get_result_cache():
+    return SharedResultCache(os.path.join(CACHE_DIR, "results"), lock_timeout=QUERY_TIMEOUT)
+
+def run_query_cached(query, params, data_version):
+    if RESULT_CACHE != "shared":
+        return run_query_memory(query, params, data_version)
+    # 키는 실제로 실행하는 SQL 기준 (ranking_snapshot 설정이 바뀌면 다른 결과)
+    key = SharedResultCache.key(restrict_to_latest_snapshot(query, data_version), params, data_version)
+    df, _ = get_result_cache().get(key, lambda: fetch_query(query, params, data_version))
+    return df
+
+# run_query_cached를 호출하고 캐시에서 꺼낸 경우를 텔레메트리에 기록 (실제 실행은 fetch_query가 기록)
+def run_query_recorded(query, params, data_version, name=None):
+    telemetry = get_telemetry()
+    template = telemetry.register_query(query, name)
+    query_thread_state.fetched = False
+    start = time.perf_counter()
+    df = run_query_cached(query, params, data_version)
+    if not query_thread_state.fetched:
+        telemetry.record("query", template, time.perf_counter() - start, cache_hit=True, rows=len(df))
+    return df
+
+# 데이터 버전이 같으면 캐시된 결과를, 바뀌었으면 새로 조회한 결과를 돌려주는 함수
+# 캐시 키는 (쿼리 템플릿, 바인딩 값, 데이터 버전)
+def run_query(query, params=None):
+    try:
+        return run_query_recorded(query, normalize_params(params), get_query_version(query))
+    except Exception as e:
+        st.error(f"쿼리 실행 오류: {e}")
+        return None
+
+######################################################
+# 서로 의존하지 않는 쿼리를 동시에 실행하는 함수
+@st.cache_resource
+def get_query_executor():
+    return ThreadPoolExecutor(max_workers=REDSHIFT_POOL_SIZE, thread_name_prefix="run_queries")
+
+def run_queries(queries: dict, timeout=QUERY_TIMEOUT, raise_errors=False) -> dict:
+    """
+    queries: {이름: 쿼리} 또는 {이름: (쿼리, 바인딩 값)}
+    timeout: 모든 쿼리를 기다리는 최대 시간(초, 제출한 시점부터 한 번만 계산)
+    raise_errors: True면 실패한 쿼리의 오류를 그대로 발생시킴
+    반환값: {이름: DataFrame} (실패하거나 시간이 초과된 쿼리는 None)
+    기다리지 않게 된 쿼리는 아직 시작 전이면 취소하고, 실행 중이면 끝까지 실행된다.
+    (결과는 run_query_recorded의 캐시에 남아 다음 요청이 사용, 그동안 실행기 스레드 하나를 차지)
+    """
+    ctx = get_script_run_ctx(suppress_warning=True)  # 워밍업 스레드에서는 None
+
+    def run(query, params, data_version, name):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return run_query_recorded(query, params, data_version, name)
+
+    executor = get_query_executor()
+    futures = {}
+    for name, query in queries.items():
+        query, params = query if isinstance(query, tuple) else (query, None)
+        futures[name] = executor.submit(run, query, normalize_params(params), get_query_version(query), name)
+    deadline = time.monotonic() + timeout
+
+    results = {}
+    try:
+        for name, future in futures.items():
+            try:
+                results[name] = future.result(timeout=max(0, deadline - time.monotonic()))
+            except Exception as e:
+                if raise_errors:
+                    raise
+                if isinstance(e, FuturesTimeoutError):
+                    st.error(f"쿼리 시간 초과: {name}")
+                else:
+                    st.error(f"쿼리 실행 오류: {e}")
+                results[name] = None
+    finally:
+        for future in futures.values():
+            future.cancel()  # 끝났거나 실행 중인 쿼리는 그대로
+    return results
+
+# 메인 페이지 상단 카드에 쓰는 지표
+@dataclass(frozen=True)
+class KpiSnapshot:
+    last_update: object  # 마지막 적재 시각 (없으면 None)
+    avg_winning_rate: float
+    avg_team_worth: float
+    popular_team_color: str
+    avg_enhance_level: float
+
+# 상단 카드 지표를 한 번에 가져오는 쿼리 (ranking_info는 한 번만 스캔)
+query_kpi = """
+WITH ranking_summary AS (
+    SELECT
+        MAX(created_at) AS last_update,
+        AVG(winning_rate) AS avg_winning_rate,
+        AVG(team_worth) AS avg_team_worth
+    FROM analytics.ranking_info
+),
+enhance_summary AS (
+    SELECT AVG(spgrade) AS avg_enhance_level
+    FROM analytics.match_info
+)
+SELECT
+    rs.last_update,
+    rs.avg_winning_rate,
+    rs.avg_team_worth,
+    (
+        SELECT team_color
+        FROM analytics.team_color_info
+        GROUP BY team_color
+        ORDER BY COUNT(*) DESC
+        LIMIT 1
+    ) AS popular_team_color,
+    es.avg_enhance_level
+FROM ranking_summary rs
+CROSS JOIN enhance_summary es;
+"""
+
+# 상단 카드 지표를 KpiSnapshot으로 돌려주는 함수
+def load_kpi_snapshot(df_kpi=None) -> KpiSnapshot:
+    """
+    df_kpi: 이미 조회한 query_kpi 결과 (없으면 여기서 조회)
+    """
+    if df_kpi is None:
+        df_kpi = run_query(query_kpi)
+    row = df_kpi.iloc[0].to_dict() if df_kpi is not None and not df_kpi.empty else {}
+
+    def value(column, default):
+        result = row.get(column)
+        return default if result is None or pd.isna(result) else result
+
+    return KpiSnapshot(
+        last_update=value("last_update", None),
+        avg_winning_rate=value("avg_winning_rate", 0),
+        avg_team_worth=value("avg_team_worth", 0),
+        popular_team_color=value("popular_team_color", "정보 없음"),
+        avg_enhance_level=value("avg_enhance_level", 0),
+    )
     
 ##########################################################################
 # 숫자 변환
@@ -80,13 +451,252 @@ def format_korean_unit(value: float, mode: str = "all") -> str:
     
 # 이미지 없는 경우
 default_image_url = "https://clipart-library.com/new_gallery/131-1313837_transparent-white-silhouette-png.png"
-# 이미지가 존재하는지 확인하는 함수
-def check_image_exists(url):
+# 선수 이미지 주소 (spid로 포매팅)
+player_image_base_url = "https://fco.dn.nexoncdn.co.kr/live/externalAssets/common/playersAction/p{spid}.png"
+
+IMAGE_CHECK_TIMEOUT = 2  # 이미지 요청 1건당 최대 대기 시간(초)
+IMAGE_CHECK_WORKERS = 16  # 동시에 보내는 HEAD 요청 수
+
+# keep-alive 연결을 재사용하는 세션 (모든 사용자가 공유)
+@st.cache_resource
+def get_image_session():
+    session = requests.Session()
+    # 이미지 서버도 같이 쓰므로 받아 올 수 있는 호스트마다 연결 풀 하나
+    adapter = HTTPAdapter(pool_connections=len(image_proxy_hosts()), pool_maxsize=IMAGE_CHECK_WORKERS)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+# 여러 이미지의 존재 여부를 한 번에 확인하는 함수
+def check_images_exist(urls) -> dict:
+    """
+    urls: 확인할 이미지 URL 목록
+    반환값: {url: 존재 여부} 딕셔너리 (요청 실패/시간 초과는 None)
+    """
+    unique_urls = list(dict.fromkeys(urls))
+    if not unique_urls:
+        return {}
+
+    session = get_image_session()
+    telemetry = get_telemetry()
+
+    def head(url):
+        start = time.perf_counter()
+        try:
+            response = session.head(url, timeout=IMAGE_CHECK_TIMEOUT)
+            exists = response.status_code == 200
+        except requests.RequestException:
+            exists = None  # 확인 실패 (시간 초과 등)
+        telemetry.record("image", "cdn_head", time.perf_counter() - start, error=exists is None)
+        return exists
+
+    with ThreadPoolExecutor(max_workers=min(IMAGE_CHECK_WORKERS, len(unique_urls))) as executor:
+        results = list(executor.map(head, unique_urls))
+    return dict(zip(unique_urls, results))
+
+# spid별 이미지 존재 여부 인덱스 (디스크에 저장, 모든 세션/프로세스가 공유)
+IMAGE_INDEX_PATH = os.path.join(CACHE_DIR, IMAGE_INDEX_FILE)
+
+query_image_spids = "SELECT DISTINCT spid FROM analytics.player_image_info WHERE url IS NOT NULL;"
+
+@st.cache_resource
+def get_image_index():
+    return ImageAvailabilityIndex(IMAGE_INDEX_PATH)
+
+# player_image_info의 데이터 버전마다 한 번 인덱스에 등록 (실패하면 캐시하지 않으므로 다음 호출에서 다시 시도)
+@st.cache_resource(max_entries=1)
+def seed_image_index(data_version):
+    get_telemetry().register_query(query_image_spids, "image_index_seed")
+    df_images = fetch_query(query_image_spids, data_version=data_version)
+    get_image_index().seed(df_images["spid"])
+    return True
+
+# 선수 목록의 이미지 주소를 한 번에 구하는 함수 (이미지가 없으면 기본 이미지)
+def get_player_image_urls(spids) -> dict:
+    start = time.perf_counter()
+    index = get_image_index()
     try:
-        response = requests.head(url)
-        return response.status_code == 200
-    except Exception as e:
-        return False
+        seed_image_index(get_query_version(query_image_spids))
+    except Exception:
+        pass  # 등록하지 못해도 모르는 spid는 CDN에 확인
+    available = index.lookup(spids)
+
+    # 인덱스에 없거나 TTL이 지난 spid만 CDN에 확인
+    unknown = [spid for spid, value in available.items() if value is None]
+    if unknown:
+        urls = {spid: player_image_base_url.format(spid=spid) for spid in unknown}
+        exists = check_images_exist(urls.values())
+        checked = {spid: exists[url] for spid, url in urls.items() if exists[url] is not None}
+        index.store(checked)
+        available.update(checked)
+
+    get_telemetry().record(
+        "image", "image_index", time.perf_counter() - start,
+        cache_hit=not unknown, rows=len(available)
+    )
+    return {
+        spid: proxied_image_url(player_image_base_url.format(spid=spid) if value else default_image_url, THUMBNAIL_WIDTH)
+        for spid, value in available.items()
+    }
+
+##########################################################################
+# 이미지 서버 (IMAGE_PROXY_URL을 설정한 경우)
+# - CDN 이미지를 한 번만 받아 화면에 표시하는 너비로 줄인 썸네일을 디스크(CACHE_DIR/thumbnails)에 저장
+# - GET /image?src=<원본 URL>&w=<너비>: 썸네일을 오래 캐시해도 되는 헤더와 함께 전달
+#   (ETag는 썸네일 내용의 해시 -> 같은 이미지면 304, 원본을 받지 못하면 원본 URL로 redirect)
+THUMBNAIL_WIDTH = 100  # 선수 이미지 표시 너비 (st.image(..., width=100))
+SEASON_BADGE_WIDTH = 50  # 메인 페이지 시즌 아이콘 표시 너비
+THUMBNAIL_WIDTHS = {THUMBNAIL_WIDTH, SEASON_BADGE_WIDTH}  # 요청을 허용하는 너비 (없으면 원본 크기)
+IMAGE_FETCH_TIMEOUT = 5  # 원본 이미지 요청 1건당 최대 대기 시간(초)
+IMAGE_FETCH_MAX_REDIRECTS = 3  # 원본 이미지 요청이 따라가는 최대 redirect 수
+# 항상 받아 올 수 있는 이미지 호스트 (선수/기본 이미지)
+IMAGE_PROXY_HOSTS = {urlsplit(player_image_base_url).hostname, urlsplit(default_image_url).hostname}
+
+# 받아 올 수 있는 이미지 호스트: IMAGE_PROXY_HOSTS + season_info.image_url의 호스트 (차원 테이블 버전마다 갱신)
+def image_proxy_hosts():
+    try:
+        return IMAGE_PROXY_HOSTS | get_dimensions().season_image_hosts
+    except Exception:
+        return IMAGE_PROXY_HOSTS  # 차원 테이블을 불러오지 못하면 고정 호스트만
+
+# 이미지 서버를 쓰면 썸네일 주소로, 아니면 원래 주소를 그대로 돌려주는 함수
+def proxied_image_url(url, width=None):
+    if not IMAGE_PROXY_URL or not isinstance(url, str) or urlsplit(url).hostname not in image_proxy_hosts():
+        return url
+    params = {"src": url} if width is None else {"src": url, "w": width}
+    return f"{IMAGE_PROXY_URL.rstrip('/')}/image?{urlencode(params)}"
+
+# 원본 이미지를 받는 함수: redirect는 직접 따라가며 image_proxy_hosts() 안의 주소만 요청
+# (requests가 자동으로 따라가면 허용한 호스트의 redirect로 임의의 주소를 요청하게 됨)
+def fetch_image(session, url) -> bytes:
+    for _ in range(IMAGE_FETCH_MAX_REDIRECTS + 1):
+        response = session.get(url, timeout=IMAGE_FETCH_TIMEOUT, allow_redirects=False)
+        if not response.is_redirect:
+            response.raise_for_status()
+            return response.content
+        url = urljoin(url, response.headers["Location"])
+        if urlsplit(url).hostname not in image_proxy_hosts():
+            raise ValueError(f"허용하지 않는 호스트로 redirect: {url}")
+    raise ValueError(f"redirect가 {IMAGE_FETCH_MAX_REDIRECTS}번을 넘음: {url}")
+
+@st.cache_resource
+def get_thumbnail_cache():
+    session = get_image_session()
+    return ThumbnailCache(os.path.join(CACHE_DIR, "thumbnails"), lambda url: fetch_image(session, url))
+
+def image_proxy_handler(thumbnails, telemetry):
+    class ImageProxyHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            params = parse_qs(url.query)
+            src = params.get("src", [""])[0]
+            width = params.get("w", [None])[0]
+            if (url.path != "/image" or urlsplit(src).scheme != "https"
+                    or urlsplit(src).hostname not in image_proxy_hosts()
+                    or (width is not None and (not width.isdigit() or int(width) not in THUMBNAIL_WIDTHS))):
+                self.send_error(404)
+                return
+
+            start = time.perf_counter()
+            try:
+                digest, data, cache_hit = thumbnails.get(src, int(width) if width else None)
+            except Exception:
+                telemetry.record("image", "thumbnail", time.perf_counter() - start, cache_hit=False, error=True)
+                self.send_response(302)  # 브라우저가 원본을 직접 받도록
+                self.send_header("Location", src)
+                self.end_headers()
+                return
+            telemetry.record(
+                "image", "thumbnail", time.perf_counter() - start,
+                cache_hit=cache_hit, rows=1, result_bytes=len(data)
+            )
+
+            etag = f'"{digest}"'
+            cache_headers = {"ETag": etag, "Cache-Control": f"public, max-age={THUMBNAIL_MAX_AGE}"}
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                for name, value in cache_headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in cache_headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass  # 이미지 요청마다 로그를 남기지 않음
+    return ImageProxyHandler
+
+@st.cache_resource
+def start_image_proxy():
+    try:
+        server = ThreadingHTTPServer(("0.0.0.0", IMAGE_PROXY_PORT), image_proxy_handler(get_thumbnail_cache(), get_telemetry()))
+    except OSError:
+        return None  # 포트를 이미 사용 중 (같은 호스트의 다른 프로세스가 같은 캐시 폴더로 서비스)
+    threading.Thread(target=server.serve_forever, name="image-proxy", daemon=True).start()
+    return server
+##########################################################################
+# 랭커 닉네임 인덱스: 데이터 버전마다 한 번 만들어 모든 세션이 공유
+# 검색어는 인덱스에서 먼저 확인하고, 있는 닉네임일 때만 Redshift에서 랭커 정보를 조회
+query_nicknames = """
+SELECT gamer_nickname, MIN(ranking) AS ranking
+FROM analytics.ranking_info
+GROUP BY gamer_nickname;
+"""
+
+@st.cache_resource(max_entries=2)
+def load_nickname_index(data_version):
+    df_nicknames = fetch_query(query_nicknames, data_version=data_version)
+    return NicknameIndex(df_nicknames["gamer_nickname"], df_nicknames["ranking"])
+
+def get_nickname_index():
+    # 반환값: NicknameIndex (만들지 못하면 None -> 검색어로 바로 조회)
+    try:
+        return load_nickname_index(get_query_version(query_nicknames))
+    except Exception:
+        return None
+
+##########################################################################
+# 선수 후기 감정분석 요약: 데이터 버전마다 한 번 만들어 모든 세션이 공유
+# 인기 선수 쿼리는 후기 테이블을 조인하지 않고, 결과의 spid로 판정을 한 번에 찾아 붙임
+@st.cache_resource(max_entries=2)
+def load_sentiment_summary(data_version):
+    get_telemetry().register_query(query_sentiment_summary, "sentiment_summary")
+    return SentimentSummary(fetch_query(query_sentiment_summary))
+
+def get_sentiment_summary():
+    return load_sentiment_summary(get_query_version(query_sentiment_summary))
+
+# spid 컬럼으로 감정분석 판정(emotion_analysis: 긍정/부정/후기 없음)을 붙인 DataFrame
+def add_emotion_analysis(df):
+    return df.assign(emotion_analysis=get_sentiment_summary().verdicts(df["spid"]))
+
+##########################################################################
+# 차원 테이블(시즌/등급/포지션/선수 정보): 데이터 버전마다 한 번 읽어 모든 세션이 공유
+# 페이지 쿼리는 id별 집계만 조회하고 선수 이름, 시즌 아이콘, 등급/세부 포지션 이름은 메모리에서 붙임
+@st.cache_resource(max_entries=2)
+def load_dimensions(data_version):
+    return Dimensions(**run_queries(dimension_queries, raise_errors=True))
+
+def get_dimensions():
+    return load_dimensions(get_query_version(" ".join(dimension_queries.values())))
+
+# division_id별 결과에 등급 이름을 붙여 첫 컬럼(등급)으로 (등급 이름순, 같은 등급 안에서는 쿼리 순서 유지)
+def with_division_names(df):
+    df = get_dimensions().attach_divisions(df)
+    columns = ["등급"] + [column for column in df.columns if column not in ("등급", "division_id")]
+    return df[columns].sort_values("등급", kind="stable", ignore_index=True)
+
+# 포지션 id별 사용 수(position, num) -> 세부 포지션 이름별 사용 수(name, num), 사용 수 내림차순
+def detail_position_counts(df_usage):
+    df_usage = df_usage.assign(name=df_usage["position"].map(get_dimensions().position_names))  # NULL 포지션은 이름 없음
+    df_detail = df_usage.dropna(subset=["name"]).groupby("name")["num"].sum().astype("int64").reset_index()
+    return df_detail.sort_values("num", ascending=False, kind="stable", ignore_index=True)
+
 ##########################################################################
 
 # 페이지 주소 설정
@@ -116,8 +726,21 @@ search_option = st.sidebar.radio("검색 유형을 선택하세요", ["랭커 
 
 if search_option == "랭커 검색":
     ranker_name = st.sidebar.text_input("랭커 이름을 입력하세요:")
-    if ranker_name and st.sidebar.button("검색"):
-        change_page(f"ranker_{ranker_name}")
+    if ranker_name:
+        nickname_index = get_nickname_index()
+        if nickname_index is None:
+            nickname, suggestions = ranker_name, []
+        else:
+            nickname, suggestions = nickname_index.resolve(ranker_name)
+
+        if nickname is not None:
+            if st.sidebar.button("검색"):
+                change_page(f"ranker_{nickname}")
+        else:
+            st.sidebar.caption("일치하는 랭커가 없습니다." + (" 혹시 이 랭커를 찾으시나요?" if suggestions else ""))
+        for suggestion in suggestions:
+            if st.sidebar.button(suggestion, key=f"ranker_suggestion_{suggestion}"):
+                change_page(f"ranker_{suggestion}")
 
 #elif search_option == "선수 검색":
 #    player_name = st.sidebar.text_input("선수 이름을 입력하세요:")
@@ -153,193 +776,176 @@ if st.sidebar.button("GK"):
 #     change_page("main")
 ##########################################################################
 
-# 메인 페이지 (기본 화면)와 등급별 페이지의 공통 내용을 위한 함수
-def main_page():
-    st.title("FC온라인 대시보드 🚀")
+# 증분 집계 (REFRESH_MODE = "incremental")
+# 인기 선수 TOP 10, 포지션별 사용 수/평균 강화 등급, 등급별 평균 팀 가치를 누적 집계에서 계산
+# 인기 선수 TOP 10(전체/포지션별/등급별)은 Space-Saving 스케치에서 바로 꺼냄 (오차 한계는 admin 페이지에서 확인)
+# 등급별 인기 선수는 행을 더할 때의 최신 랭킹 스냅샷 등급으로 집계 (전체 집계는 랭커의 모든 스냅샷과 조인)
+# 등급별 강화 레벨처럼 ranking_info와 조인하는 나머지 집계는 항상 전체 집계
+# 누적 팀 가치는 모든 스냅샷의 평균이므로 RANKING_SNAPSHOT = "all"일 때만 집계 (최신 스냅샷만 보면 쿼리로 조회)
+INCREMENTAL_TEAM_WORTH = RANKING_SNAPSHOT == "all"
 
-    # 우상단 업데이트 날짜
-    query_update = "SELECT MAX(created_at) AS last_update FROM analytics.ranking_info;"
-    df_update = run_query(query_update)
-    last_update = df_update.loc[0, "last_update"] if not df_update.empty else "정보 없음"
-    
-    formatted_date = f"{last_update.year}년 {last_update.month}월 {last_update.day}일"
-    st.markdown(f"<div style='text-align: right; font-size:24px;'>데이터 업데이트:{formatted_date}</div>", unsafe_allow_html=True)
-    
-    # # 데이터 새로고침 버튼
-    # _, col_btn = st.columns([7, 1])
-
-    # with col_btn:
-    #     if st.button("데이터 새로고침", key="refresh_button"):
-    #         st.cache_data.clear()
-    
-    st.header("TOP 1000 랭커")
-    
-    ##########################################################################
-    # # 카드 4개: 평균 승률, 평균 구단가치, 인기 팀컬러, 평균 강화레벨
-    # 1) 평균 승률
-    query_avg_win = "SELECT AVG(winning_rate) AS avg_winning_rate FROM analytics.ranking_info;"
-    df_avg_win = run_query(query_avg_win)
-    avg_winning_rate = df_avg_win.loc[0, "avg_winning_rate"] if not df_avg_win.empty else 0
-    
-    # 2) 평균 구단가치
-    query_avg_worth = "SELECT AVG(team_worth) AS avg_team_worth FROM analytics.ranking_info;"
-    df_avg_worth = run_query(query_avg_worth)
-    avg_team_worth = df_avg_worth.loc[0, "avg_team_worth"] if not df_avg_worth.empty else 0
-    
-    # 3) 인기 팀컬러
-    query_team_color = """
-    SELECT team_color
-    FROM analytics.team_color_info
-    GROUP BY team_color
-    ORDER BY COUNT(*) DESC
-    LIMIT 1;
-    """
-    df_team_color = run_query(query_team_color)
-    popular_team_color = df_team_color.loc[0, "team_color"] if not df_team_color.empty else "정보 없음"
-    
-    # 4) 평균 강화 레벨
-    query_avg_enhance = "SELECT AVG(spgrade) AS avg_enhance_level FROM analytics.match_info;"
-    df_avg_enhance = run_query(query_avg_enhance)
-    avg_enhance_level = df_avg_enhance.loc[0, "avg_enhance_level"] if not df_avg_enhance.empty else 0
-    
-    col1, col2, col3, col4 = st.columns(4)
-    col1.metric("평균 승률", f"{avg_winning_rate:.1f}%")
-    col2.metric("평균 구단가치", f"{format_korean_unit(avg_team_worth, mode='eok')}")
-    col3.metric("인기 팀컬러", popular_team_color)
-    col4.metric("평균 강화레벨", f"{avg_enhance_level}")
-    
-    st.markdown("---")
-    
-    ##########################################################################
-    # --- 오늘의 인기선수 순위 10명 ---
-    st.header("오늘의 인기 선수 TOP 10")
-    
-    top10_query = """
-    WITH top_players AS (
-        SELECT 
-            spid, 
-            COUNT(*) AS usage_count, 
-            LEFT(spid, 3) AS season_id
-        FROM analytics.match_info
-        GROUP BY spid
-        ORDER BY usage_count DESC
-        LIMIT 10
-    )
-    SELECT 
-        p.name,
-        tp.usage_count,
-        tp.spid AS spid,
-        si.image_url AS season_img_url,
-        CASE 
-            WHEN COUNT(CASE WHEN pri.prediction = 1 THEN 1 END) = 0 THEN '후기 없음'
-            WHEN COUNT(CASE WHEN pri.prediction = 1 THEN 1 END) >= COUNT(CASE WHEN pri.prediction = 0 THEN 1 END) THEN '긍정'
-            ELSE '부정'
-        END AS emotion_analysis
-    FROM top_players tp
-    JOIN analytics.player_info p ON tp.spid = p.spid
-    LEFT JOIN analytics.player_image_info pii ON tp.spid = pii.spid
-    LEFT JOIN analytics.season_info si ON tp.season_id = si.season_id
-    LEFT JOIN analytics.player_review_info pri ON tp.spid = pri.spid
-    GROUP BY p.name, tp.spid, tp.usage_count, pii.url, si.image_url
-    ORDER BY tp.usage_count DESC;
+@st.cache_resource
+def get_incremental_aggregates():
+    return IncrementalAggregates(fetch_query, track_team_worth=INCREMENTAL_TEAM_WORTH)
+
+# 데이터 버전이 바뀌었으면 새로 적재된 행을 더한 누적 집계를 돌려주는 함수
+def load_incremental_aggregates():
+    aggregates = get_incremental_aggregates()
+    aggregates.refresh(get_query_version(query_match_delta + (query_ranking_delta if INCREMENTAL_TEAM_WORTH else "")))
+    return aggregates
+
+# 선수 목록(spid)의 후기 수: 전체, 긍정(prediction = 1), 부정(prediction = 0) (spid 개수만큼 %s)
+def review_counts_query(num_spids):
+    return f"""
+    SELECT
+        spid,
+        COUNT(*) AS total,
+        COUNT(CASE WHEN prediction = 1 THEN 1 END) AS positive,
+        COUNT(CASE WHEN prediction = 0 THEN 1 END) AS negative
+    FROM analytics.player_review_info
+    WHERE spid IN ({", ".join(["%s"] * num_spids)})
+    GROUP BY spid;
     """
-    
-    top10_player = run_query(top10_query)
-    
-    popular_players = top10_player.to_dict('records') # 쿼리 결과를 딕셔너리 리스트로 변환
-    
-    if "toggle_details" not in st.session_state:
-        st.session_state.toggle_details = {}
-        
-    # 5열씩 2행 배치 (예시)
-    num_cols = 5
-    rows = [popular_players[i : i + num_cols] for i in range(0, len(popular_players), num_cols)]
-    
-    for row in rows:
-        cols = st.columns(num_cols)
-        for idx, player in enumerate(row):
-            with cols[idx]:
-                # 선수 이미지 URL 포매팅: spid를 이용해 생성
-                player_image_url = f"https://fco.dn.nexoncdn.co.kr/live/externalAssets/common/playersAction/p{player['spid']}.png"
-                if not check_image_exists(player_image_url):
-                    player_image_url = default_image_url
-                st.image(player_image_url,width=100)
-                
-                # 토글 상태 초기화
-                if player["name"] not in st.session_state.toggle_details:
-                    st.session_state.toggle_details[player["name"]] = False
-
-
-                # 버튼 클릭 시 상태 토글 (선수 이름 버튼)
-                if st.button(player["name"], key=f"btn_{player['name']}"):
-                    st.session_state.toggle_details[player["name"]] = not st.session_state.toggle_details[player["name"]]
-                
-                # 토글 상태가 True이면 상세 정보 표시:
-                if st.session_state.toggle_details[player["name"]]:
-                    season_img = player.get('season_img_url')
-                    
-                    st.markdown(f"""
-                        <div style='display: flex; align-items: center; gap: 5px;'>
-                            <img src="{season_img}" width="50"/>
-                        </div>
-                    """, unsafe_allow_html=True)
-                    
-                    st.write('')
-                    
-                    st.write(f"**{player['usage_count']}명의 랭커가 사용하고 있어요**")
-                    
-                    # 감정분석 결과를 멘트로 변환해서 출력
-                    emotion_analysis = player['emotion_analysis']
 
-                    if emotion_analysis == '긍정':
-                        message = "😃 감독들에게 평가가 좋아요!"
-                    elif emotion_analysis == '부정':
-                        message = "😞 평가가 좋지는 않네요.."
-                    else:
-                        message = "📢 후기가 없어요."
-                    
-                    st.write(f"**{message}**")
-                    
-    st.markdown("---")
+# 페이지에 나온 선수들의 후기 수를 한 번에 조회 -> {spid: {"total", "positive", "negative"}}
+# (후기가 없는 선수는 모두 0, 선수를 바꿔 선택할 때는 다시 조회하지 않음)
+def load_review_counts(spids) -> dict:
+    spids = list(dict.fromkeys(spids))
+    counts = {spid: {"total": 0, "positive": 0, "negative": 0} for spid in spids}
+    if not spids:
+        return counts
+    df_counts = run_query(review_counts_query(len(spids)), spids)
+    if df_counts is None:
+        return counts
+    for row in df_counts.to_dict("records"):
+        counts[row["spid"]] = {name: int(row[name]) for name in ("total", "positive", "negative")}
+    return counts
+
+# 사용 수 상위 선수(spid, 사용 수)에 선수 이름, 시즌, 감정분석 결과를 붙인 DataFrame
+# (순서 유지, player_info에 없는 선수는 제외)
+def load_top_players(top_players):
+    return add_emotion_analysis(get_dimensions().attach_players(top_players).reset_index(drop=True))
 
-
-    ##########################################################################
-    # 등급별 구단 가치, 등급별 강화 레벨 수준, 포지션별 평균 강화 레벨
-    category_order = [
-    "슈퍼챔피언스", "챔피언스", "슈퍼챌린저",
-    "챌린저 1부", "챌린저 2부", "챌린저 3부",
-    "월드클래스 1부", "월드클래스 2부", "월드클래스 3부"
-    ]
-    
-    rename_map = {
-    "슈퍼챌린지": "슈퍼챌린저",
-    "챌린지1": "챌린저 1부",
-    "챌린지2": "챌린저 2부",
-    "챌린지3": "챌린저 3부",
-    "월드클래스1": "월드클래스 1부",
-    "월드클래스2": "월드클래스 2부",
-    "월드클래스3": "월드클래스 3부"
-    }
-        
+# 메인 페이지 (기본 화면)와 등급별 페이지의 공통 내용을 위한 함수
+# 메인 페이지 쿼리 (서로 의존하지 않으므로 동시에 실행)
+main_page_queries = {
+    # 상단 카드 지표
+    "kpi": query_kpi,
+    # 오늘의 인기 선수 TOP 10
+    "top10": """
+    SELECT 
+        spid, 
+        COUNT(*) AS usage_count
+    FROM analytics.match_info
+    GROUP BY spid
+    ORDER BY usage_count DESC
+    LIMIT 10;
+    """,
     # 1. 등급별 구단 가치
-    query_team_value = """
+    "team_value": """
     SELECT 
-        d.division_name AS 등급,
-        AVG(r.team_worth) AS "평균 팀 가치"
-    FROM analytics.ranking_info r
-    JOIN analytics.division_info d ON r.division_id = d.division_id
-    GROUP BY d.division_name
-    ORDER BY d.division_name;
-    """
+        division_id,
+        AVG(team_worth) AS "평균 팀 가치"
+    FROM analytics.ranking_info
+    GROUP BY division_id;
+    """,
+    # 2. 등급별 강화레벨 수준
+    "avg_grade": """
+    SELECT 
+        r.division_id,
+        COALESCE(AVG(mi.spgrade), 0) AS "평균 강화 레벨"
+    FROM analytics.ranking_info r 
+    LEFT JOIN analytics.match_info mi 
+        ON r.gamer_nickname = mi.gamer_nickname
+    GROUP BY r.division_id;
+    """,
+    # 3. 포지션별 강화 레벨
+    "avg_position": f"""
+    WITH {position_category_cte}
+    SELECT 
+        UPPER(position_cat) AS 포지션,
+        AVG(spgrade) AS "평균 강화 레벨"
+    FROM (
+        SELECT 
+            mi.spgrade,
+            COALESCE(pc.position_cat, '{DEFAULT_POSITION_CATEGORY}') AS position_cat
+        FROM analytics.match_info mi
+        LEFT JOIN position_category pc
+            ON mi."position" = pc.position_id
+    ) t
+    GROUP BY position_cat
+    ORDER BY position_cat;
+    """,
+}
+
+# 증분 집계 모드에서 누적 집계로 계산하는 메인 페이지 결과 (나머지는 main_page_queries로 조회)
+INCREMENTAL_MAIN_FRAMES = ["top10", "avg_position"] + (["team_value"] if INCREMENTAL_TEAM_WORTH else [])
+
+def load_incremental_main_frames() -> dict:
+    aggregates = load_incremental_aggregates()
+    frames = {}
+
+    df_top10 = load_top_players(aggregates.top_players(10).rename(columns={"num": "usage_count"}))
+    frames["top10"] = df_top10[["name", "usage_count", "spid", "season_img_url", "emotion_analysis"]]
+
+    if "team_value" in INCREMENTAL_MAIN_FRAMES:
+        frames["team_value"] = with_division_names(aggregates.division_team_worth().rename(columns={"avg_team_worth": "평균 팀 가치"}))
+
+    df_usage = aggregates.position_usage()
+    df_usage = df_usage.assign(포지션=position_category(df_usage["position"]))
+    df_position = df_usage.groupby("포지션")[["spgrade_sum", "spgrade_count"]].sum().reset_index()
+    df_position["평균 강화 레벨"] = df_position["spgrade_sum"] / df_position["spgrade_count"]
+    df_position["포지션"] = df_position["포지션"].str.upper()
+    frames["avg_position"] = df_position[["포지션", "평균 강화 레벨"]]
+
+    return frames
+
+# 메인 페이지 쿼리 결과(spid/division_id별 집계)에 선수 정보와 등급 이름을 붙이는 함수
+def resolve_main_frames(frames):
+    if frames.get("top10") is not None:
+        df_top10 = load_top_players(frames["top10"])
+        frames["top10"] = df_top10[["name", "usage_count", "spid", "season_img_url", "emotion_analysis"]]
+    for name in ("team_value", "avg_grade"):
+        if frames.get(name) is not None:
+            frames[name] = with_division_names(frames[name])
+
+# 메인 페이지 결과 (raise_errors=True면 실패한 쿼리의 오류를 그대로 발생시킴)
+def load_main_page_frames(raise_errors=False) -> dict:
+    incremental = REFRESH_MODE == "incremental"
+    queries = {
+        name: query for name, query in main_page_queries.items()
+        if not (incremental and name in INCREMENTAL_MAIN_FRAMES)
+    }
+    frames = run_queries(queries, raise_errors=raise_errors)
+    try:
+        resolve_main_frames(frames)
+    except Exception as e:
+        if raise_errors:
+            raise
+        st.error(f"쿼리 실행 오류: {e}")
+        frames.update({name: None for name in ("top10", "team_value", "avg_grade") if name in frames})
+    if not incremental:
+        return frames
 
-    df_team_value = run_query(query_team_value)
-    df_team_value["등급"] = df_team_value["등급"].replace(rename_map)
-    df_team_value["구단가치"] = df_team_value["평균 팀 가치"].apply(lambda x: format_korean_unit(x, mode='jo'))
-    
-    
-    fig_team_value = (
+    try:
+        frames.update(load_incremental_main_frames())
+    except Exception as e:
+        if raise_errors:
+            raise
+        st.error(f"쿼리 실행 오류: {e}")
+        frames.update({name: None for name in INCREMENTAL_MAIN_FRAMES})
+    return frames
+
+# 차트 캐시: 같은 데이터 버전, 같은 파라미터의 Plotly 차트는 한 번만 만들어 모든 세션/재실행이 공유
+# (데이터프레임 인자는 앞에 _를 붙여 캐시 키에서 제외, 결과는 data_version과 파라미터로 결정됨)
+# cache_data처럼 pickle로 복사하지 않고 만든 Figure 객체를 그대로 재사용
+FIGURE_CACHE_MAX_ENTRIES = 100
+
+@st.cache_resource(max_entries=FIGURE_CACHE_MAX_ENTRIES)
+def build_team_value_figure(data_version, _df_team_value, category_order):
+    return (
     px.bar(
-        df_team_value,
+        _df_team_value,
         x="등급",
         y="평균 팀 가치",       
         text="구단가치",
@@ -367,28 +973,11 @@ def main_page():
     )
     )
 
-    # 2. 등급별 강화레벨 수준
-    query_avg_grade = """
-    SELECT 
-        d.division_name AS 등급,
-        COALESCE(AVG(mi.spgrade), 0) AS "평균 강화 레벨"
-    FROM analytics.division_info d
-    JOIN analytics.ranking_info r 
-        ON d.division_id = r.division_id
-    LEFT JOIN analytics.match_info mi 
-        ON r.gamer_nickname = mi.gamer_nickname
-    GROUP BY d.division_name
-    ORDER BY d.division_name;
-    """
-    
-    df_grade = run_query(query_avg_grade)
-    df_grade["등급"] = df_grade["등급"].replace(rename_map)
-    # "평균 강화 레벨"이 0인 행은 제거
-    df_grade = df_grade[df_grade["평균 강화 레벨"] != 0]
-    
-    fig_grade = (
+@st.cache_resource(max_entries=FIGURE_CACHE_MAX_ENTRIES)
+def build_grade_figure(data_version, _df_grade, category_order):
+    return (
     px.bar(
-        df_grade,
+        _df_grade,
         x="등급",
         y="평균 강화 레벨",
         text = "평균 강화 레벨",
@@ -417,35 +1006,11 @@ def main_page():
     )
     )
 
-        
-    ##########################################################################
-    # 3. 포지션별 강화 레벨 
-    query_avg_position = """
-    SELECT 
-        position_cat AS 포지션,
-        AVG(spgrade) AS "평균 강화 레벨"
-    FROM (
-        SELECT 
-            spgrade,
-            CASE
-                WHEN "position" IN (1,2,3,4,5,6,7,8) THEN 'DF'
-                WHEN "position" IN (20,21,22,23,24,25,26,27) THEN 'FW'
-                WHEN "position" = 0 THEN 'GK'
-                WHEN "position" = 28 THEN 'SUB'
-                ELSE 'MF'
-            END AS position_cat
-        FROM analytics.match_info
-    ) t
-    GROUP BY position_cat
-    ORDER BY position_cat;
-    """
-    
-    df_position = run_query(query_avg_position)
-    position_order = ["FW", "MF", "DF", "GK", "SUB"]
-
-    fig_position = (
+@st.cache_resource(max_entries=FIGURE_CACHE_MAX_ENTRIES)
+def build_position_figure(data_version, _df_position, position_order):
+    return (
         px.bar(
-        df_position,
+        _df_position,
         x="포지션",
         y="평균 강화 레벨",
         text="평균 강화 레벨",
@@ -476,6 +1041,153 @@ def main_page():
         )
     )
 
+# 인기 선수 카드 하나 (fragment: 이름 버튼을 누르면 페이지 전체가 아니라 이 카드만 다시 실행)
+@st.fragment
+def top10_player_card(player, image_url):
+    st.image(image_url,width=100)
+    
+    # 토글 상태 초기화 (같은 선수가 여러 시즌으로 있을 수 있으므로 spid 기준)
+    if player["spid"] not in st.session_state.toggle_details:
+        st.session_state.toggle_details[player["spid"]] = False
+
+
+    # 버튼 클릭 시 상태 토글 (선수 이름 버튼)
+    if st.button(player["name"], key=f"btn_{player['spid']}"):
+        st.session_state.toggle_details[player["spid"]] = not st.session_state.toggle_details[player["spid"]]
+    
+    # 토글 상태가 True이면 상세 정보 표시:
+    if st.session_state.toggle_details[player["spid"]]:
+        season_img = player.get('season_img_url')
+        
+        st.markdown(f"""
+            <div style='display: flex; align-items: center; gap: 5px;'>
+                <img src="{proxied_image_url(season_img, SEASON_BADGE_WIDTH)}" width="50"/>
+            </div>
+        """, unsafe_allow_html=True)
+        
+        st.write('')
+        
+        st.write(f"**{player['usage_count']}명의 랭커가 사용하고 있어요**")
+        
+        # 감정분석 결과를 멘트로 변환해서 출력
+        emotion_analysis = player['emotion_analysis']
+
+        if emotion_analysis == '긍정':
+            message = "😃 감독들에게 평가가 좋아요!"
+        elif emotion_analysis == '부정':
+            message = "😞 평가가 좋지는 않네요.."
+        else:
+            message = "📢 후기가 없어요."
+        
+        st.write(f"**{message}**")
+
+def main_page():
+    st.title("FC온라인 대시보드 🚀")
+
+    # 차트 캐시 키로 쓰는 데이터 버전은 결과를 불러오기 전에 한 번만 확인
+    # (불러온 뒤에 확인하면 그 사이 버전이 바뀌었을 때 예전 결과로 만든 차트가 새 버전 키로 저장됨)
+    main_version = get_query_version(" ".join(main_page_queries.values()))
+
+    # 메인 페이지 쿼리를 동시에 실행
+    frames = load_main_page_frames()
+
+    # 상단 카드 지표 (업데이트 날짜, 평균 승률, 평균 구단가치, 인기 팀컬러, 평균 강화레벨)
+    kpi = load_kpi_snapshot(frames["kpi"])
+    
+    # 우상단 업데이트 날짜
+    last_update = kpi.last_update
+    formatted_date = f"{last_update.year}년 {last_update.month}월 {last_update.day}일" if last_update is not None else "정보 없음"
+    st.markdown(f"<div style='text-align: right; font-size:24px;'>데이터 업데이트:{formatted_date}</div>", unsafe_allow_html=True)
+    
+    # 데이터 새로고침 버튼: 데이터 버전을 바로 다시 확인 (바뀐 테이블의 결과만 새로 조회)
+    _, col_btn = st.columns([7, 1])
+
+    with col_btn:
+        if st.button("데이터 새로고침", key="refresh_button"):
+            get_data_versions.clear()
+            st.rerun()
+    
+    st.header("TOP 1000 랭커")
+    
+    ##########################################################################
+    # # 카드 4개: 평균 승률, 평균 구단가치, 인기 팀컬러, 평균 강화레벨
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("평균 승률", f"{kpi.avg_winning_rate:.1f}%")
+    col2.metric("평균 구단가치", f"{format_korean_unit(kpi.avg_team_worth, mode='eok')}")
+    col3.metric("인기 팀컬러", kpi.popular_team_color)
+    col4.metric("평균 강화레벨", f"{kpi.avg_enhance_level}")
+    
+    st.markdown("---")
+    
+    ##########################################################################
+    # --- 오늘의 인기선수 순위 10명 ---
+    st.header("오늘의 인기 선수 TOP 10")
+    
+    top10_player = frames["top10"]
+    
+    popular_players = top10_player.to_dict('records') # 쿼리 결과를 딕셔너리 리스트로 변환
+    
+    if "toggle_details" not in st.session_state:
+        st.session_state.toggle_details = {}
+        
+    # 5열씩 2행 배치 (예시)
+    num_cols = 5
+    rows = [popular_players[i : i + num_cols] for i in range(0, len(popular_players), num_cols)]
+    
+    # 10명의 이미지 존재 여부를 한 번에 확인
+    image_urls = get_player_image_urls([player["spid"] for player in popular_players])
+    
+    for row in rows:
+        cols = st.columns(num_cols)
+        for idx, player in enumerate(row):
+            with cols[idx]:
+                top10_player_card(player, image_urls[player["spid"]])
+                    
+    st.markdown("---")
+
+
+    ##########################################################################
+    # 등급별 구단 가치, 등급별 강화 레벨 수준, 포지션별 평균 강화 레벨
+    category_order = [
+    "슈퍼챔피언스", "챔피언스", "슈퍼챌린저",
+    "챌린저 1부", "챌린저 2부", "챌린저 3부",
+    "월드클래스 1부", "월드클래스 2부", "월드클래스 3부"
+    ]
+    
+    rename_map = {
+    "슈퍼챌린지": "슈퍼챌린저",
+    "챌린지1": "챌린저 1부",
+    "챌린지2": "챌린저 2부",
+    "챌린지3": "챌린저 3부",
+    "월드클래스1": "월드클래스 1부",
+    "월드클래스2": "월드클래스 2부",
+    "월드클래스3": "월드클래스 3부"
+    }
+        
+    # 1. 등급별 구단 가치
+    df_team_value = frames["team_value"]
+    df_team_value["등급"] = df_team_value["등급"].replace(rename_map)
+    df_team_value["구단가치"] = df_team_value["평균 팀 가치"].apply(lambda x: format_korean_unit(x, mode='jo'))
+    
+    
+    fig_team_value = build_team_value_figure(main_version, df_team_value, category_order)
+
+    # 2. 등급별 강화레벨 수준
+    df_grade = frames["avg_grade"]
+    df_grade["등급"] = df_grade["등급"].replace(rename_map)
+    # "평균 강화 레벨"이 0인 행은 제거
+    df_grade = df_grade[df_grade["평균 강화 레벨"] != 0]
+    
+    fig_grade = build_grade_figure(main_version, df_grade, category_order)
+
+        
+    ##########################################################################
+    # 3. 포지션별 강화 레벨 
+    df_position = frames["avg_position"]
+    position_order = ["FW", "MF", "DF", "GK", "SUB"]
+
+    fig_position = build_position_figure(main_version, df_position, position_order)
+
     # # 4. 게이머 레벨 분포
     # query_gamer_level = """
     # SELECT gamer_level AS "레벨"
@@ -504,98 +1216,317 @@ def main_page():
     # )
     
 
-    
-    col1, col2 = st.columns(2)
+    
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.plotly_chart(fig_position, use_container_width=True) 
+
+    with col2:
+        st.plotly_chart(fig_grade, use_container_width=True)
+        
+    st.plotly_chart(fig_team_value, use_container_width=True)
+    
+##########################################################################
+# 등급별 페이지
+grade_name_map = {
+    "super_champions": "슈퍼챔피언스",
+    "champions": "챔피언스",
+    "superchallengers": "슈퍼챌린저",
+    "challengers": "챌린저",
+    "worldclass": "월드클래스"
+}
+
+# 등급별 페이지 쿼리: 모든 등급의 결과를 한 번에 계산
+grade_page_queries = {
+    # 1. 랭커 정보
+    "rankers": """
+        WITH team_color_summary AS (
+            SELECT
+                gamer_nickname,
+                MIN(team_color) AS team_color
+            FROM analytics.team_color_info
+            GROUP BY gamer_nickname
+        ),
+        ranked_players AS (
+            SELECT
+                r.division_id,
+                r.ranking AS 순위,
+                r.gamer_nickname AS 닉네임,
+                r.team_worth AS 팀_가치,
+                r.winning_rate AS 승률,
+                r.total_win AS 승,
+                r.total_draw  AS 무,
+                r.total_lose  AS 패,
+                tc.team_color AS 팀컬러,
+                r.formation AS 포메이션,
+                ROW_NUMBER() OVER (
+                    PARTITION BY r.division_id
+                    ORDER BY r.ranking ASC
+                ) AS rn
+            FROM (
+                SELECT DISTINCT gamer_nickname, ranking, division_id, team_worth, winning_rate, total_win, total_draw, total_lose, formation
+                FROM analytics.ranking_info
+            ) r
+            LEFT JOIN team_color_summary tc
+                ON r.gamer_nickname = tc.gamer_nickname
+        )
+        SELECT
+            p.division_id,
+            p.순위,
+            p.닉네임,
+            p.팀_가치,
+            p.승률,
+            p.승,
+            p.무,
+            p.패,
+            p.팀컬러,
+            p.포메이션
+        FROM ranked_players p
+        WHERE p.division_id IN (0, 1, 2, 3, 6)
+        AND p.rn <= 10
+        ORDER BY p.division_id, p.순위;
+    """,
+    # 2. 인기 선수
+    "players": """
+        WITH usage_count AS (
+            SELECT
+                r.division_id,
+                mi.spid,
+                COUNT(mi.spid) AS usage_count
+            FROM analytics.match_info mi
+            JOIN analytics.ranking_info r
+                ON mi.gamer_nickname = r.gamer_nickname
+            GROUP BY r.division_id, mi.spid
+        ),
+        ranked_players AS (
+            SELECT
+                division_id,
+                spid,
+                usage_count,
+                ROW_NUMBER() OVER (PARTITION BY division_id ORDER BY usage_count DESC) AS rn
+            FROM usage_count
+        )
+        SELECT
+            division_id,
+            spid,
+            usage_count
+        FROM ranked_players
+        WHERE rn <= 10
+        ORDER BY division_id, usage_count DESC;
+    """,
+    # 3. 인기 포메이션
+    "formations": """
+        WITH formation_rank AS (
+            SELECT 
+                r.division_id,
+                r.formation AS 포메이션,
+                COUNT(*) AS 사용횟수,
+                ROW_NUMBER() OVER (
+                    PARTITION BY r.division_id 
+                    ORDER BY COUNT(*) DESC
+                ) AS rn
+            FROM analytics.ranking_info r
+            GROUP BY r.division_id, r.formation
+        )
+        SELECT division_id, 포메이션, 사용횟수
+        FROM formation_rank
+        WHERE rn <= 10
+        ORDER BY division_id, rn;
+    """,
+    # 4. 인기 팀 컬러
+    "team_colors": """
+        WITH color_rank AS (
+            SELECT 
+                r.division_id,
+                tc.team_color AS 팀컬러,
+                COUNT(*) AS 사용횟수,
+                ROW_NUMBER() OVER (
+                    PARTITION BY r.division_id
+                    ORDER BY COUNT(*) DESC
+                ) AS rn
+            FROM analytics.ranking_info r
+            LEFT JOIN analytics.team_color_info tc 
+                ON r.gamer_nickname = tc.gamer_nickname
+            GROUP BY r.division_id, tc.team_color
+        )
+        SELECT division_id, 팀컬러, 사용횟수
+        FROM color_rank
+        WHERE rn <= 7
+        ORDER BY division_id, rn;
+    """,
+}
+
+# 증분 집계 모드의 등급별 인기 선수 (등급별 스케치의 상위 limit명, grade_page_queries["players"]와 같은 컬럼)
+def load_incremental_division_players(limit=10):
+    aggregates = load_incremental_aggregates()
+    frames = [
+        aggregates.top_players(limit, division_id=division_id).assign(division_id=division_id)
+        for division_id in aggregates.division_ids()
+    ]
+    if not frames:
+        return pd.DataFrame({"division_id": [], "spid": [], "usage_count": []}, dtype="int64")
+    df_players = pd.concat(frames, ignore_index=True).rename(columns={"num": "usage_count"})
+    return df_players[["division_id", "spid", "usage_count"]]
+
+# 모든 등급의 결과를 등급 이름별 DataFrame으로 나눠 두는 함수 (데이터 버전별로 한 번만 계산)
+# cache_data처럼 매번 pickle로 복사하지 않고 모든 세션이 같은 객체를 읽기 전용으로 공유 (최근 두 버전만 보관)
+@st.cache_resource(max_entries=2)
+def load_grade_page_frames(data_version) -> dict:
+    """
+    반환값: {등급 이름: {"rankers": df, "players": df, "formations": df, "team_colors": df}}
+    """
+    if REFRESH_MODE == "incremental":
+        frames = run_queries({name: query for name, query in grade_page_queries.items() if name != "players"}, raise_errors=True)
+        frames["players"] = load_incremental_division_players()
+    else:
+        frames = run_queries(grade_page_queries, raise_errors=True)
+    df_rankers = with_division_names(frames["rankers"])
+    df_popular_players = get_dimensions().attach_players(frames["players"], name_column="선수이름")
+    df_popular_players = with_division_names(df_popular_players)[["등급", "선수이름", "spid", "usage_count", "season_img_url"]]
+    df_formations = with_division_names(frames["formations"])
+    df_team_color = with_division_names(frames["team_colors"])
+
+    # 1. 랭커 정보
+    rename_map = {
+    "슈퍼챌린지": "슈퍼챌린저",
+    "챌린지1": "챌린저",
+    "월드클래스1": "월드클래스",
+    }
+    df_rankers["등급"] = df_rankers["등급"].replace(rename_map)
+    df_rankers["팀 가치"] = df_rankers["팀_가치"].astype(float).apply(lambda x: format_korean_unit(x, mode='eok'))
+    df_rankers["승률"] = df_rankers["승률"].astype(float)
+
+    # 2. 인기 선수
+    rename_map = {
+        "슈퍼챌린지": "슈퍼챌린저",
+        "챌린지1": "챌린저",
+        "챌린지2": "챌린저",
+        "챌린지3": "챌린저",
+        "월드클래스1": "월드클래스",
+        "월드클래스2": "월드클래스",
+        "월드클래스3": "월드클래스"
+    }
+    df_popular_players["등급"] = df_popular_players["등급"].replace(rename_map)
+    df_popular_players = add_emotion_analysis(df_popular_players)
+
+    frames = {
+        "rankers": df_rankers,
+        "players": df_popular_players,
+        "formations": df_formations,
+        "team_colors": df_team_color,
+    }
+    grade_frames = {grade_name: {} for grade_name in grade_name_map.values()}
+    for name, df in frames.items():
+        groups = dict(tuple(df.groupby("등급", sort=False)))
+        for grade_name in grade_frames:
+            grade_frames[grade_name][name] = groups.get(grade_name, df.iloc[0:0]).reset_index(drop=True)
+    return grade_frames
+
+@st.cache_resource(max_entries=FIGURE_CACHE_MAX_ENTRIES)
+def build_formation_figure(data_version, _df_formations, grade_name):
+    return (
+    px.bar(
+        _df_formations,
+        x="포메이션",
+        y="사용횟수",
+        color="포메이션",
+        text="사용횟수",
+        title=f"{grade_name} 인기 포메이션",
+        color_discrete_sequence=px.colors.qualitative.T10
+    )
+    .update_traces(textposition="outside")
+    .update_layout(
+        title={'font': {'size': 25}},
+        plot_bgcolor="black",
+        paper_bgcolor="black",
+        font_color="white",
+        showlegend=False,
+        xaxis=dict(showgrid=False, color="white", tickfont=dict(size=16)),
+        yaxis=dict(showgrid=False, color="white", tickfont=dict(size=20))
+    )
+    )
+
+@st.cache_resource(max_entries=FIGURE_CACHE_MAX_ENTRIES)
+def build_team_color_figure(data_version, _df_team_color, grade_name):
+    return (
+    px.pie(
+        _df_team_color,
+        values="사용횟수",
+        names="팀컬러",
+        title=f"{grade_name} 인기 팀컬러 TOP 10",
+        color="팀컬러",
+        color_discrete_sequence=px.colors.qualitative.T10,
+        hole=0.5
+    )
+    .update_traces(
+        textposition="outside",
+        textinfo="percent+label"  
+    )
+    .update_layout(
+        # width=800,
+        # height=600,
+        plot_bgcolor="black",
+        paper_bgcolor="black",
+        font_color="white",
+        title={'font': {'size': 25}},
+        legend=dict(font=dict(size=20))
+    )
+    )
+
+# 선수 선택 초기화 (콜백은 fragment 재실행 전에 호출되므로 st.rerun 없이 바로 반영됨)
+def clear_selected_player():
+    st.session_state.selected_player = None
 
+# 등급별 인기 선수 목록 + 상세 정보 (fragment: 선수를 바꿔도 이 부분만 다시 실행)
+@st.fragment
+def grade_player_list(df_filtered, image_urls):
+    col1, col2 = st.columns([1, 2])
     with col1:
-        st.plotly_chart(fig_position, use_container_width=True) 
+        for player, spid in zip(df_filtered["선수이름"], df_filtered["spid"]):
+            if st.button(player, key=spid):
+                st.session_state.selected_player = spid
 
     with col2:
-        st.plotly_chart(fig_grade, use_container_width=True)
-        
-    st.plotly_chart(fig_team_value, use_container_width=True)
-    
-##########################################################################
-# 등급별 페이지
+        if st.session_state.selected_player:
+            player_info = df_filtered[df_filtered["spid"] == st.session_state.selected_player]
+            if not player_info.empty:
+                player_info = player_info.iloc[0]
+
+                emotion_analysis = player_info['emotion_analysis']
+                if emotion_analysis == '긍정':
+                    message = "😃 이 선수는 감독들에게 평가가 좋아요!"
+                elif emotion_analysis == '부정':
+                    message = "😞 이 선수의 평가가 좋지는 않네요.."
+                else:
+                    message = "📢 이 선수의 후기가 없어요. 첫 번째 후기를 남겨주세요"
+                
+                
+                
+                with st.expander(f"📌 {player_info['선수이름']} 상세 정보", expanded=True):
+                    st.image(proxied_image_url(player_info["season_img_url"]))
+                    st.image(image_urls[player_info["spid"]],width=100)
+                    st.write(f"**선수 이름:** {player_info['선수이름']}")
+                    st.write(f"**사용 횟수:** {player_info['usage_count']}")
+                    st.subheader(f"**{message}**")
+
+                st.button("⬅ 선수 선택 초기화", on_click=clear_selected_player)
+
 def grade_page(grade_key: str):
-    grade_name_map = {
-    "super_champions": "슈퍼챔피언스",
-    "champions": "챔피언스",
-    "superchallengers": "슈퍼챌린저",
-    "challengers": "챌린저",
-    "worldclass": "월드클래스"
-    }
     grade_name = grade_name_map.get(grade_key, None)
     st.title(f"⚽ {grade_name} TOP 10 랭커 정보")
 
-    # 1. 랭커 정보
-    query_ranker_info = """
-    WITH team_color_summary AS (
-        SELECT
-            gamer_nickname,
-            MIN(team_color) AS team_color
-        FROM analytics.team_color_info
-        GROUP BY gamer_nickname
-    ),
-    ranked_players AS (
-        SELECT
-            r.division_id,
-            r.ranking AS 순위,
-            r.gamer_nickname AS 닉네임,
-            r.team_worth AS 팀_가치,
-            r.winning_rate AS 승률,
-            r.total_win AS 승,
-            r.total_draw  AS 무,
-            r.total_lose  AS 패,
-            tc.team_color AS 팀컬러,
-            r.formation AS 포메이션,
-            ROW_NUMBER() OVER (
-                PARTITION BY r.division_id
-                ORDER BY r.ranking ASC
-            ) AS rn
-        FROM (
-            SELECT DISTINCT gamer_nickname, ranking, division_id, team_worth, winning_rate, total_win, total_draw, total_lose, formation
-            FROM analytics.ranking_info
-        ) r
-        JOIN analytics.division_info d
-            ON r.division_id = d.division_id
-        LEFT JOIN team_color_summary tc
-            ON r.gamer_nickname = tc.gamer_nickname
-    )
-    SELECT
-        d.division_name AS 등급,
-        p.순위,
-        p.닉네임,
-        p.팀_가치,
-        p.승률,
-        p.승,
-        p.무,
-        p.패,
-        p.팀컬러,
-        p.포메이션
-    FROM ranked_players p
-    JOIN analytics.division_info d
-        ON p.division_id = d.division_id
-    WHERE p.division_id IN (0, 1, 2, 3, 6)
-    AND p.rn <= 10
-    ORDER BY d.division_name, p.순위;
-    """
-
-    df_rankers = run_query(query_ranker_info)
-    rename_map = {
-    "슈퍼챌린지": "슈퍼챌린저",
-    "챌린지1": "챌린저",
-    "월드클래스1": "월드클래스",
-    }
+    try:
+        data_version = get_query_version(" ".join(grade_page_queries.values()))
+        grade_frames = load_grade_page_frames(data_version)[grade_name]
+    except Exception as e:
+        st.error(f"쿼리 실행 오류: {e}")
+        return
 
-    df_rankers["등급"] = df_rankers["등급"].replace(rename_map)
-    df_rankers["팀 가치"] = df_rankers["팀_가치"].astype(float).apply(lambda x: format_korean_unit(x, mode='eok'))
-    
-    grade_df = df_rankers[df_rankers["등급"] == grade_name]
+    # 1. 랭커 정보
+    grade_df = grade_frames["rankers"]
     
     display_df = grade_df[["닉네임", "팀 가치", "팀컬러", "포메이션", "승률", "승", "무", "패" ]]
-    display_df["승률"] = display_df["승률"].astype(float)
-    display_df = display_df.reset_index(drop=True)
     display_df.index = display_df.index + 1
     styled_df = display_df.style \
         .format({
@@ -624,64 +1555,7 @@ def grade_page(grade_key: str):
 
     # 2) 인기 선수
     st.subheader(f"{grade_name} 인기 선수 Top10")
-    rename_map = {
-        "슈퍼챌린지": "슈퍼챌린저",
-        "챌린지1": "챌린저",
-        "챌린지2": "챌린저",
-        "챌린지3": "챌린저",
-        "월드클래스1": "월드클래스",
-        "월드클래스2": "월드클래스",
-        "월드클래스3": "월드클래스"
-    }
-    
-    query_division_top10_players = """
-    WITH usage_count AS (
-        SELECT
-            d.division_name AS 등급,
-            mi.spid,
-            COUNT(mi.spid) AS usage_count
-        FROM analytics.match_info mi
-        JOIN analytics.ranking_info r
-            ON mi.gamer_nickname = r.gamer_nickname
-        JOIN analytics.division_info d
-            ON r.division_id = d.division_id
-        GROUP BY d.division_name, mi.spid
-    ),
-    ranked_players AS (
-        SELECT
-            등급,
-            spid,
-            usage_count,
-            ROW_NUMBER() OVER (PARTITION BY 등급 ORDER BY usage_count DESC) AS rn
-        FROM usage_count
-    )
-    SELECT
-        rp.등급,
-        p.name AS 선수이름,
-        rp.spid,
-        rp.usage_count,
-        s.image_url AS season_img_url,
-        CASE 
-            WHEN COUNT(CASE WHEN pri.prediction = 1 THEN 1 END) = 0 THEN '후기 없음'
-            WHEN COUNT(CASE WHEN pri.prediction = 1 THEN 1 END) >= COUNT(CASE WHEN pri.prediction = 0 THEN 1 END) THEN '긍정'
-            ELSE '부정'
-        END AS emotion_analysis
-    FROM ranked_players rp
-    JOIN analytics.player_info p
-        ON rp.spid = p.spid
-    LEFT JOIN analytics.season_info s
-        ON LEFT(rp.spid, 3) = s.season_id
-    LEFT JOIN analytics.player_review_info pri
-        ON rp.spid = pri.spid
-    WHERE rp.rn <= 10
-    GROUP BY rp.등급, p.name, rp.spid, rp.usage_count, s.image_url
-    ORDER BY rp.등급, rp.usage_count DESC;
-    """
-
-    df_popular_players = run_query(query_division_top10_players)
-    df_popular_players["등급"] = df_popular_players["등급"].replace(rename_map)
-    
-    df_filtered = df_popular_players[df_popular_players["등급"] == grade_name]
+    df_filtered = grade_frames["players"]
     if df_filtered.empty:
         st.warning(f"{grade_name} 인기 선수 데이터가 없습니다.")
         return
@@ -689,141 +1563,22 @@ def grade_page(grade_key: str):
     if "selected_player" not in st.session_state:
         st.session_state.selected_player = None
 
-    col1, col2 = st.columns([1, 2])
-    with col1:
-        for player, spid in zip(df_filtered["선수이름"], df_filtered["spid"]):
-            if st.button(player, key=spid):
-                st.session_state.selected_player = spid
-
-    with col2:
-        if st.session_state.selected_player:
-            player_info = df_filtered[df_filtered["spid"] == st.session_state.selected_player]
-            if not player_info.empty:
-                player_info = player_info.iloc[0]
-
-                emotion_analysis = player_info['emotion_analysis']
-                if emotion_analysis == '긍정':
-                    message = "😃 이 선수는 감독들에게 평가가 좋아요!"
-                elif emotion_analysis == '부정':
-                    message = "😞 이 선수의 평가가 좋지는 않네요.."
-                else:
-                    message = "📢 이 선수의 후기가 없어요. 첫 번째 후기를 남겨주세요"
-                
-                
-                
-                with st.expander(f"📌 {player_info['선수이름']} 상세 정보", expanded=True):
-                    st.image(player_info["season_img_url"])
-                    player_image_url = f"https://fco.dn.nexoncdn.co.kr/live/externalAssets/common/playersAction/p{player_info['spid']}.png"
-                    if not check_image_exists(player_image_url):
-                        player_image_url = default_image_url
-                    st.image(player_image_url,width=100)
-                    st.write(f"**선수 이름:** {player_info['선수이름']}")
-                    st.write(f"**사용 횟수:** {player_info['usage_count']}")
-                    st.subheader(f"**{message}**")
+    # 목록에 있는 선수들의 이미지 존재 여부를 한 번에 확인
+    image_urls = get_player_image_urls(df_filtered["spid"])
 
-                if st.button("⬅ 선수 선택 초기화"):
-                    st.session_state.selected_player = None
-                    st.rerun()
+    grade_player_list(df_filtered, image_urls)
 
     st.markdown("---")
     
     # 3. 인기 포메이션
-    query_popular_formation_by_division = """
-    WITH formation_rank AS (
-        SELECT 
-            d.division_name AS 등급,
-            r.formation AS 포메이션,
-            COUNT(*) AS 사용횟수,
-            ROW_NUMBER() OVER (
-                PARTITION BY d.division_name 
-                ORDER BY COUNT(*) DESC
-            ) AS rn
-        FROM analytics.ranking_info r
-        JOIN analytics.division_info d 
-            ON r.division_id = d.division_id
-        GROUP BY d.division_name, r.formation
-    )
-    SELECT 등급, 포메이션, 사용횟수
-    FROM formation_rank
-    WHERE rn <= 10
-    ORDER BY 등급, rn;
-    """
-    
-    df_formations = run_query(query_popular_formation_by_division)
-    df_formations = df_formations[df_formations["등급"] == grade_name]
+    df_formations = grade_frames["formations"]
     
-    fig_formation = (
-    px.bar(
-        df_formations,
-        x="포메이션",
-        y="사용횟수",
-        color="포메이션",
-        text="사용횟수",
-        title=f"{grade_name} 인기 포메이션",
-        color_discrete_sequence=px.colors.qualitative.T10
-    )
-    .update_traces(textposition="outside")
-    .update_layout(
-        title={'font': {'size': 25}},
-        plot_bgcolor="black",
-        paper_bgcolor="black",
-        font_color="white",
-        showlegend=False,
-        xaxis=dict(showgrid=False, color="white", tickfont=dict(size=16)),
-        yaxis=dict(showgrid=False, color="white", tickfont=dict(size=20))
-    )
-    )
+    fig_formation = build_formation_figure(data_version, df_formations, grade_name)
     
     # 4. 인기 팀 컬러
-    query_popular_team_color_by_division = """
-    WITH color_rank AS (
-        SELECT 
-            d.division_name AS 등급,
-            tc.team_color AS 팀컬러,
-            COUNT(*) AS 사용횟수,
-            ROW_NUMBER() OVER (
-                PARTITION BY d.division_name
-                ORDER BY COUNT(*) DESC
-            ) AS rn
-        FROM analytics.ranking_info r
-        JOIN analytics.division_info d 
-            ON r.division_id = d.division_id
-        LEFT JOIN analytics.team_color_info tc 
-            ON r.gamer_nickname = tc.gamer_nickname
-        GROUP BY d.division_name, tc.team_color
-    )
-    SELECT 등급, 팀컬러, 사용횟수
-    FROM color_rank
-    WHERE rn <= 7
-    ORDER BY 등급, rn;
-    """
-    df_team_color = run_query(query_popular_team_color_by_division)
-    df_team_color = df_team_color[df_team_color["등급"] == grade_name]
+    df_team_color = grade_frames["team_colors"]
     
-    fig_team_color = (
-    px.pie(
-        df_team_color,
-        values="사용횟수",
-        names="팀컬러",
-        title=f"{grade_name} 인기 팀컬러 TOP 10",
-        color="팀컬러",
-        color_discrete_sequence=px.colors.qualitative.T10,
-        hole=0.5
-    )
-    .update_traces(
-        textposition="outside",
-        textinfo="percent+label"  
-    )
-    .update_layout(
-        # width=800,
-        # height=600,
-        plot_bgcolor="black",
-        paper_bgcolor="black",
-        font_color="white",
-        title={'font': {'size': 25}},
-        legend=dict(font=dict(size=20))
-    )
-    )
+    fig_team_color = build_team_color_figure(data_version, df_team_color, grade_name)
     
     col1, col2 = st.columns(2)
 
@@ -838,44 +1593,104 @@ def grade_page(grade_key: str):
 
 ###################################################################
 # 포지션 카테고리
-def position_page(position):
-    st.title(f"랭커들이 애용하는 {position} 포지션 선수 분석")
+# 포지션 페이지 쿼리 (%s 두 자리에 같은 포지션을 바인딩, 서로 의존하지 않으므로 동시에 실행)
+position_page_queries = {
+    # 사용 수 상위 선수 (선수 이름, 시즌은 차원 테이블에서 붙임)
+    "players": f"""
+    WITH {position_category_cte}
+    SELECT spid, COUNT(*) AS "num"
+    FROM analytics.match_info
+    WHERE {position_filter_sql()}
+    GROUP BY spid
+    ORDER BY num DESC
+    LIMIT 10;
+    """,
+    # 세부 포지션 비중 (포지션 id별 사용 수, 이름은 차원 테이블에서 붙임)
+    "detail_positions": f"""WITH {position_category_cte}
+            SELECT "position", COUNT(*) AS "num"
+            FROM analytics.match_info
+            WHERE {position_filter_sql()}
+            GROUP BY "position"
+            """,
+    # 평균 강화등급
+    "avg_spgrade": f"""WITH {position_category_cte}
+        select avg(spgrade) AS avg
+        FROM analytics.match_info
+        WHERE {position_filter_sql()}""",
+}
 
-    st.subheader(f"{position} 포지션 인기 선수 Top10")
-    
-    # 선수 이름, 시즌, 감정분석 결과 등을 시각화하는 쿼리
-    query1 = f"""
-    SELECT a.name, a.spid, a.num, b.season_id, b.name as season_name, b.image_url
-    FROM (
-        SELECT name, a.season_id, a.spid, num
-        FROM (
-            SELECT spid, COUNT(*) AS "num", LEFT(spid, 3) AS season_id
-            FROM (
-                SELECT *, CASE
-                    WHEN "position" IN (1,2,3,4,5,6,7,8) THEN 'df'
-                    WHEN "position" IN (20,21,22,23,24,25,26,27) THEN 'fw'
-                    WHEN "position" = 0 THEN 'gk'
-                    WHEN "position" = 28 THEN 'sub'
-                    ELSE 'mf' END AS position_cat
-                FROM analytics.match_info
-            )
-            WHERE position_cat = '{position}'
-            GROUP BY spid
-            ORDER BY num DESC
-            LIMIT 10
-        ) a
-        JOIN analytics.player_info b ON a.spid = b.spid
-        ORDER BY num DESC
-    ) a
-    JOIN analytics.season_info b ON a.season_id = b.season_id
-    ORDER BY num DESC;
-    """
-    player_data = run_query(query1)
+# 포지션별 사용 수 상위 선수(spid, num)에 선수 이름과 시즌을 붙인 DataFrame (시즌 정보가 없는 선수는 제외)
+def position_players(top_players):
+    df_players = get_dimensions().attach_players(top_players).dropna(subset=["season_name"])
+    df_players = df_players.rename(columns={"season_img_url": "image_url"})
+    return df_players[["name", "spid", "num", "season_id", "season_name", "image_url"]].reset_index(drop=True)
 
-    # 세션 상태 초기화
-    if "selected_player" not in st.session_state:
-        st.session_state.selected_player = None
+# 증분 집계 모드의 포지션 페이지 결과
+def load_incremental_position_frames(position) -> dict:
+    aggregates = load_incremental_aggregates()
+
+    df_players = position_players(aggregates.top_players(10, category=position))
+    df_usage = aggregates.position_usage(position)
+    df_detail = detail_position_counts(df_usage)
+
+    spgrade_count = df_usage["spgrade_count"].sum()
+    df_avg = pd.DataFrame({"avg": [df_usage["spgrade_sum"].sum() / spgrade_count if spgrade_count else None]})
+
+    return {"players": df_players, "detail_positions": df_detail, "avg_spgrade": df_avg}
+
+# 포지션 페이지 결과 (raise_errors=True면 실패한 쿼리의 오류를 그대로 발생시킴)
+def load_position_page_frames(position, raise_errors=False) -> dict:
+    if REFRESH_MODE == "incremental":
+        try:
+            return load_incremental_position_frames(position)
+        except Exception as e:
+            if raise_errors:
+                raise
+            st.error(f"쿼리 실행 오류: {e}")
+            return {name: None for name in position_page_queries}
+    frames = run_queries(
+        {name: (query, (position, position)) for name, query in position_page_queries.items()},
+        raise_errors=raise_errors
+    )
+    try:
+        if frames["players"] is not None:
+            frames["players"] = position_players(frames["players"])
+        if frames["detail_positions"] is not None:
+            frames["detail_positions"] = detail_position_counts(frames["detail_positions"])
+    except Exception as e:
+        if raise_errors:
+            raise
+        st.error(f"쿼리 실행 오류: {e}")
+        frames.update({"players": None, "detail_positions": None})
+    return frames
+
+@st.cache_resource(max_entries=FIGURE_CACHE_MAX_ENTRIES)
+def build_detail_position_figure(data_version, _detail_position_data, position):
+    return (
+    px.pie(
+        _detail_position_data,
+        names="name",
+        values="num",
+        # title="포지션 별 비중",
+        color_discrete_sequence=px.colors.qualitative.T10,
+        hole=0.5
+        )
+    .update_traces(
+        textposition="outside",
+        textinfo="percent+label"
+        )
+    .update_layout(
+        plot_bgcolor="black",
+        paper_bgcolor="black",
+        font_color="white",
+        # title={'font': {'size': 25}},
+        legend=dict(font=dict(size=30))
+        )
+    )
 
+# 포지션별 인기 선수 목록 + 상세 정보 (fragment: 선수를 바꿔도 이 부분만 다시 실행)
+@st.fragment
+def position_player_list(player_data, image_urls, review_counts):
     col1, col2 = st.columns([1, 2])  # 왼쪽(버튼) 1, 오른쪽(상세정보) 2 비율
 
     # 왼쪽: 선수 목록 버튼 (세로 배치)
@@ -893,24 +1708,19 @@ def position_page(position):
             if not player_info.empty:  # ✅ 선수 데이터가 존재하는 경우에만 실행
                 player_info = player_info.iloc[0]  # 첫 번째 행 가져오기
 
-                # 감정 분석 데이터 가져오기
-                query2 = f"SELECT * FROM analytics.player_review_info WHERE spid = {st.session_state.selected_player}"
-                player_reviews = run_query(query2)
+                # 감정 분석 데이터 (페이지를 열 때 목록의 선수 전체를 한 번에 조회해 둔 후기 수)
+                player_reviews = review_counts[player_info["spid"]]
 
                 # 📌 상세 정보 팝업 (expander)
                 with st.expander(f"📌 {player_info['name']} 상세 정보", expanded=True):
-                    st.image(player_info["image_url"])
+                    st.image(proxied_image_url(player_info["image_url"]))
                     st.write(f"**시즌:** {player_info['season_name']}")
-                    spid = player_info["spid"]
-                    player_image_url = f"https://fco.dn.nexoncdn.co.kr/live/externalAssets/common/playersAction/p{spid}.png"
-                    if not check_image_exists(player_image_url):
-                        player_image_url = default_image_url
-                    st.image(player_image_url,width=100)
+                    st.image(image_urls[player_info["spid"]],width=100)
 
-                    # 긍정 & 부정 리뷰 개수 계산
-                    positive_count = sum(player_reviews["prediction"] == 1)
-                    negative_count = sum(player_reviews["prediction"] == 0)
-                    total_reviews = len(player_reviews)
+                    # 긍정 & 부정 리뷰 개수
+                    positive_count = player_reviews["positive"]
+                    negative_count = player_reviews["negative"]
+                    total_reviews = player_reviews["total"]
 
                     # ✅ 멘트 설정
                     if total_reviews == 0:
@@ -926,67 +1736,43 @@ def position_page(position):
                     st.subheader(message)
 
                 # 뒤로 가기 버튼
-                if st.button("⬅ 선수 선택 초기화"):
-                    st.session_state.selected_player = None
-                    st.rerun()
+                st.button("⬅ 선수 선택 초기화", on_click=clear_selected_player)
+
+def position_page(position):
+    st.title(f"랭커들이 애용하는 {position} 포지션 선수 분석")
+
+    st.subheader(f"{position} 포지션 인기 선수 Top10")
+    
+    position_version = get_query_version(" ".join(position_page_queries.values()))  # 결과를 불러오기 전에 확인
+    frames = load_position_page_frames(position)
+    player_data = frames["players"]
+
+    # 세션 상태 초기화
+    if "selected_player" not in st.session_state:
+        st.session_state.selected_player = None
+
+    # 목록에 있는 선수들의 이미지 존재 여부를 한 번에 확인
+    image_urls = get_player_image_urls(player_data["spid"])
+
+    # 목록에 있는 선수들의 후기 수를 한 번에 조회 (선수를 바꿔 선택해도 다시 조회하지 않음)
+    review_counts = load_review_counts(player_data["spid"].tolist())
+
+    position_player_list(player_data, image_urls, review_counts)
 
     col3, col4 = st.columns([1, 2])
 
     with col4:
         # st.subheader("세부 포지션 비중")
-        query3=f"""SELECT b.name, COUNT(*) AS "num"
-            FROM (
-                SELECT *, CASE
-                    WHEN "position" IN (1,2,3,4,5,6,7,8) THEN 'df'
-                    WHEN "position" IN (20,21,22,23,24,25,26,27) THEN 'fw'
-                    WHEN "position" = 0 THEN 'gk'
-                    WHEN "position" = 28 THEN 'sub'
-                    ELSE 'mf' END AS position_cat
-                FROM analytics.match_info
-            ) a
-            join analytics.position_info b on a.position=b.spposition
-            WHERE position_cat = '{position}'
-            GROUP BY b.name
-            ORDER BY num DESC"""
-        detail_position_data=run_query(query3)
+        detail_position_data=frames["detail_positions"]
         st.subheader("포지션 별 비중")
-        fig = (
-        px.pie(
-            detail_position_data,
-            names="name",
-            values="num",
-            # title="포지션 별 비중",
-            color_discrete_sequence=px.colors.qualitative.T10,
-            hole=0.5
-            )
-        .update_traces(
-            textposition="outside",
-            textinfo="percent+label"
-            )
-        .update_layout(
-            plot_bgcolor="black",
-            paper_bgcolor="black",
-            font_color="white",
-            # title={'font': {'size': 25}},
-            legend=dict(font=dict(size=30))
-            )
-        )
+        fig = build_detail_position_figure(position_version, detail_position_data, position)
         st.plotly_chart(fig)
         
         # Streamlit에서 파이 차트 표시
         
     with col3:
         st.subheader("평균 강화등급")
-        query4=f"""select avg(spgrade)
-        FROM (SELECT *, CASE
-        WHEN "position" IN (1,2,3,4,5,6,7,8) THEN 'df'
-        WHEN "position" IN (20,21,22,23,24,25,26,27) THEN 'fw'
-        WHEN "position" = 0 THEN 'gk'
-        WHEN "position" = 28 THEN 'sub'
-        ELSE 'mf' END AS position_cat
-        FROM analytics.match_info)
-        WHERE position_cat = '{position}'"""
-        data=run_query(query4)
+        data=frames["avg_spgrade"]
         avg_spgrade=data.loc[0,"avg"]
         st.metric(label="강화등급",value=avg_spgrade)
 
@@ -995,28 +1781,62 @@ def position_page(position):
 
         
 ##############################################################################
+# 랭커 페이지 쿼리 (%s 자리에 닉네임을 바인딩, 서로 의존하지 않으므로 동시에 실행)
+ranker_page_queries = {
+    # 1. 랭커 기본 정보
+    "info": """
+    SELECT 
+        gamer_nickname,
+        gamer_level, 
+        division_id,
+        team_worth,
+        winning_rate,
+        total_win,
+        total_draw,
+        total_lose,
+        formation
+    FROM analytics.ranking_info
+    WHERE gamer_nickname = %s
+    LIMIT 1;
+    """,
+    # 3. 랭커의 선수 목록
+    "used_players": """
+    SELECT
+        spid,
+        season_id,
+        position,
+        spgrade
+    FROM analytics.match_info
+    WHERE gamer_nickname = %s;
+    """,
+}
+
 def ranker_page(name):
+    # 없는 닉네임이면 Redshift를 조회하지 않고 비슷한 닉네임을 추천
+    nickname_index = get_nickname_index()
+    if nickname_index is not None:
+        nickname, suggestions = nickname_index.resolve(name)
+        if nickname is None:
+            st.title(f"{name}님의 정보")
+            st.error("랭커 정보를 찾을 수 없습니다.")
+            for suggestion in suggestions:
+                if st.button(f"{suggestion}님의 정보 보기", key=f"ranker_page_suggestion_{suggestion}"):
+                    change_page(f"ranker_{suggestion}")
+            return
+        name = nickname
+
     # 1. 랭커 기본 정보 
     st.title(f"{name}님의 정보")
     
-    query = f"""
-    SELECT 
-        a.gamer_nickname,
-        a.gamer_level, 
-        b.division_name,
-        a.team_worth,
-        a.winning_rate,
-        a.total_win,
-        a.total_draw,
-        a.total_lose,
-        a.formation
-    FROM analytics.ranking_info a
-    JOIN analytics.division_info b 
-        ON a.division_id = b.division_id
-    WHERE a.gamer_nickname = '{name}'
-    LIMIT 1;
-    """
-    data = run_query(query)
+    frames = run_queries({key: (query, (name,)) for key, query in ranker_page_queries.items()})
+    try:
+        dimensions = get_dimensions()  # 등급 이름, 선수 이름/시즌 아이콘
+    except Exception as e:
+        st.error(f"쿼리 실행 오류: {e}")
+        return
+    data = frames["info"]
+    if data is not None:
+        data = dimensions.attach_divisions(data, name_column="division_name").reset_index(drop=True)
     if data is None or data.empty:
         st.error("랭커 정보를 불러오지 못했습니다.")
         return
@@ -1077,44 +1897,17 @@ def ranker_page(name):
 
     st.markdown("---")
     # 3. 랭커의 선수 목록
-    query_used_players = f"""
-    WITH used_players AS (
-        SELECT
-            mi.spid,
-            mi.season_id,
-            mi.position,
-            mi.spgrade
-        FROM analytics.match_info mi
-        WHERE mi.gamer_nickname = '{name}'
-    )
-    SELECT
-        p.name AS 선수이름,
-        up.spid,
-        up.season_id,
-        up.position,
-        up.spgrade,
-        s.image_url AS season_img_url
-    FROM used_players up
-    JOIN analytics.player_info p
-        ON up.spid = p.spid
-    LEFT JOIN analytics.season_info s
-        ON LEFT(up.spid::varchar, 3) = s.season_id
-    ORDER BY p.name;
-    """
-    df_used = run_query(query_used_players)
+    df_used = frames["used_players"]
+    if df_used is not None:
+        df_used = dimensions.attach_players(df_used, name_column="선수이름").sort_values("선수이름", kind="stable", ignore_index=True)
+        df_used = df_used[["선수이름", "spid", "season_id", "position", "spgrade", "season_img_url"]]
     if df_used is None or df_used.empty:
         st.info("이 랭커가 사용하는 선수 데이터가 없습니다.")
         return
 
     st.subheader(f"{name}님의 선수 목록")
     
-    df_used["position_group"] = df_used["position"].apply(
-        lambda x: "df" if x in [1,2,3,4,5,6,7,8]
-        else ("fw" if x in [20,21,22,23,24,25,26,27]
-        else ("gk" if x == 0
-        else ("sub" if x == 28
-        else "mf")))
-    )
+    df_used["position_group"] = position_category(df_used["position"])
     pos_map = {
         "fw": "공격수",
         "mf": "미드필더",
@@ -1126,6 +1919,9 @@ def ranker_page(name):
     order = ["공격수", "미드필더", "수비수", "골키퍼", "교체선수"]
     df_used["포지션_그룹"] = pd.Categorical(df_used["포지션_그룹"], categories=order, ordered=True)
     
+    # 스쿼드 전체 선수의 이미지 존재 여부를 한 번에 확인
+    image_urls = get_player_image_urls(df_used["spid"])
+
     # 포지션 그룹별로 선수 목록 표시 (한 줄에 5명씩)
     for group, group_df in df_used.groupby("포지션_그룹"):
         st.write(f"{group}")
@@ -1137,15 +1933,12 @@ def ranker_page(name):
                 with cols[idx]:
                     html = f"""
                     <div style="display: flex; align-items: center;">
-                        <img src="{rowData.season_img_url}" style="margin-right: 5px;">
+                        <img src="{proxied_image_url(rowData.season_img_url)}" style="margin-right: 5px;">
                         <span style="font-size: 16px; margin: 0;">{rowData.선수이름}</span>
                     </div>
                     """
                     st.markdown(html, unsafe_allow_html=True)
-                    player_image_url = f"https://fco.dn.nexoncdn.co.kr/live/externalAssets/common/playersAction/p{str(rowData.spid)}.png"
-                    if not check_image_exists(player_image_url):
-                        player_image_url = default_image_url
-                    st.image(player_image_url,width=100)
+                    st.image(image_urls[rowData.spid],width=100)
 
     if st.button("⬅ 메인 화면으로 돌아가기"):
         change_page("main")
@@ -1195,10 +1988,7 @@ def ranker_page(name):
 #                    st.image(player_info["image_url"])
 #                    st.write(f"**시즌:** {player_info['season_name']}")
 #                    spid = player_info["spid"]
-#                    player_image_url = f"https://fco.dn.nexoncdn.co.kr/live/externalAssets/common/playersAction/p{spid}.png"
-#                    if not check_image_exists(player_image_url):
-#                        player_image_url = default_image_url
-#                    st.image(player_image_url,width=100)
+#                    st.image(get_player_image_urls([spid])[spid],width=100)
 #                   
 #                    # 긍정 & 부정 리뷰 개수 계산
 #                    positive_count = sum(player_reviews["prediction"] == 1)
@@ -1228,15 +2018,252 @@ def ranker_page(name):
 #    if st.button("⬅ 메인 화면으로 돌아가기"):
 #        change_page("main")
 
+###############################################################################
+# 관리자 페이지 (사이드바에 없음, ?page=admin으로만 접근)
+# 이 프로세스가 최근 처리한 쿼리/이미지 확인의 지연 시간, 행 수, 결과 크기, 캐시 적중률
+def admin_page():
+    st.title("🛠 쿼리 텔레메트리")
+
+    # 페이지별 캐시 워밍업 상태 (/ready와 같은 내용)
+    if WARMUP_ENABLED:
+        warmup = start_warmup().snapshot()
+        st.subheader(f"캐시 워밍업: {'준비 완료' if warmup['ready'] else '진행 중'}")
+        st.caption(f"PID {warmup['pid']} · 준비 상태 서버 {warmup['readiness'] or '사용 안 함'}")
+        st.dataframe(
+            pd.DataFrame([
+                {"페이지": route, "상태": info["state"], "소요 시간(초)": info["seconds"], "오류": info["error"]}
+                for route, info in warmup["routes"].items()
+            ]),
+            use_container_width=True,
+            hide_index=True
+        )
+
+    telemetry = get_telemetry()
+    summary = telemetry.summary()
+
+    if st.button("기록 초기화"):
+        telemetry.clear()
+        st.rerun()
+
+    if summary.empty:
+        st.info("아직 기록된 쿼리가 없습니다.")
+        return
+
+    queries = summary[summary["kind"] == "query"]
+    images = summary[summary["kind"] == "image"]
+    index_calls = images[images["template"] == "image_index"]
+    head_calls = images[images["template"] == "cdn_head"]
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("기록된 이벤트", f"{int(summary['calls'].sum()):,}")
+    if not queries.empty:
+        hit_ratio = (queries["hit_ratio"] * queries["calls"]).sum() / queries["calls"].sum()
+        col2.metric("쿼리 캐시 적중률", f"{hit_ratio * 100:.1f}%")
+    if not index_calls.empty:
+        col3.metric("이미지 인덱스 적중률", f"{index_calls['hit_ratio'].iloc[0] * 100:.1f}%")
+    if not head_calls.empty:
+        col4.metric("CDN 확인 p95", f"{head_calls['p95_ms'].iloc[0]:.0f}ms")
+
+    # 1. 템플릿별 요약 (누적 시간이 큰 순)
+    st.subheader("템플릿별 요약")
+    display_df = summary.rename(columns={
+        "kind": "종류",
+        "template": "템플릿",
+        "name": "이름",
+        "tables": "테이블",
+        "calls": "호출 수",
+        "hit_ratio": "캐시 적중률",
+        "p50_ms": "p50(ms)",
+        "p95_ms": "p95(ms)",
+        "max_ms": "최대(ms)",
+        "total_ms": "누적(ms)",
+        "avg_rows": "평균 행 수",
+        "avg_bytes": "평균 결과 크기(B)",
+        "errors": "오류",
+    })
+    st.dataframe(display_df, use_container_width=True, hide_index=True)
+
+    # 2. 지연 시간 분포
+    st.subheader("지연 시간 분포")
+    labels = {
+        row["template"]: f"{row['name'] or row['tables'] or row['template']} ({row['template']})"
+        for _, row in summary.iterrows()
+    }
+    template = st.selectbox("템플릿", list(labels), format_func=labels.get)
+    histogram = telemetry.histogram()
+    fig_histogram = px.bar(
+        histogram[histogram["template"] == template],
+        x="bucket",
+        y="count",
+        labels={"bucket": "지연 시간", "count": "호출 수"}
+    )
+    st.plotly_chart(fig_histogram, use_container_width=True)
+
+    sql = telemetry.templates().get(template, {}).get("sql")
+    if sql:
+        with st.expander("쿼리 보기"):
+            st.code(sql, language="sql")
+
+    # 3. 인기 선수 스케치 오차 확인 (증분 집계 모드)
+    if REFRESH_MODE == "incremental":
+        st.subheader("인기 선수 스케치")
+        st.caption("전체/포지션별 TOP 10 추정값을 워터마크까지의 정확한 사용 수와 비교합니다 (match_info 전체 집계 쿼리 1회).")
+        if st.button("정확한 집계와 비교"):
+            df_check = load_incremental_aggregates().check_sketches(10)
+            st.dataframe(
+                df_check.rename(columns={
+                    "sketch": "스케치",
+                    "total": "누적 사용 수",
+                    "tracked": "추적 중인 선수 수",
+                    "max_error": "최대 오차",
+                    "within_bounds": "오차 범위 안",
+                    "top_k": "TOP 10 일치",
+                    "guaranteed": "보장된 선수 수",
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+
+###############################################################################
+# 캐시 워밍업: 파라미터가 고정된 페이지(메인, 등급 5개, 포지션 4개)의 쿼리 결과와 이미지 존재 여부를
+# 백그라운드 스레드에서 미리 계산해 st.cache_data/이미지 인덱스를 채움
+# - 데이터 버전이 바뀌면(ETL 적재) 다시 채우고, 그동안 해당 페이지는 cold로 표시
+# - 준비 상태는 READINESS_HOST:READINESS_PORT의 /ready (모두 warm이면 200, 아니면 503)로 로드밸런서에 알림
+# - Streamlit에는 서버 시작 훅이 없으므로 첫 스크립트 실행 때 시작됨
+#   (.streamlit/config.toml의 scriptHealthCheckEnabled로 배포 직후 /_stcore/script-health-check를 한 번 호출)
+WARMUP_INTERVAL = DATA_VERSION_TTL  # 데이터 버전 변경을 확인하는 주기(초)
+GRADE_ROUTES = ["super_champions", "champions", "superchallengers", "challengers", "worldclass"]
+POSITION_ROUTES = ["fw", "mf", "df", "gk"]
+WARMUP_ROUTES = ["main"] + GRADE_ROUTES + POSITION_ROUTES
+
+def warm_main():
+    frames = load_main_page_frames(raise_errors=True)
+    get_player_image_urls(frames["top10"]["spid"])
+
+def warm_grade(grade_key):
+    data_version = get_query_version(" ".join(grade_page_queries.values()))
+    grade_frames = load_grade_page_frames(data_version)[grade_name_map[grade_key]]
+    get_player_image_urls(grade_frames["players"]["spid"])
+
+def warm_position(position):
+    frames = load_position_page_frames(position, raise_errors=True)
+    get_player_image_urls(frames["players"]["spid"])
+    load_review_counts(frames["players"]["spid"].tolist())
+
+def warm_route(route):
+    if route == "main":
+        warm_main()
+    elif route in GRADE_ROUTES:
+        warm_grade(route)
+    else:
+        warm_position(route)
+
+class WarmupStatus:
+    """
+    페이지별 워밍업 상태: cold(아직/데이터 변경) -> warming -> warm (실패하면 failed, 다음 주기에 재시도)
+    데이터 버전이 바뀌면 모든 페이지가 cold로 돌아감
+    """
+    def __init__(self, routes):
+        self._lock = threading.Lock()
+        self.data_version = None
+        self.readiness = None  # 준비 상태 서버 주소 또는 열지 못한 이유
+        self._routes = {route: {"state": "cold", "seconds": None, "error": None, "updated_at": None} for route in routes}
+
+    def set(self, route, state, seconds=None, error=None):
+        with self._lock:
+            self._routes[route] = {"state": state, "seconds": seconds, "error": error, "updated_at": time.time()}
+
+    def state(self, route):
+        with self._lock:
+            return self._routes[route]["state"]
+
+    def reset(self, data_version):
+        with self._lock:
+            self.data_version = data_version
+            for route in self._routes:
+                self._routes[route] = {"state": "cold", "seconds": None, "error": None, "updated_at": time.time()}
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            routes = {route: dict(info) for route, info in self._routes.items()}
+        return {
+            "ready": all(info["state"] == "warm" for info in routes.values()),
+            "pid": os.getpid(),
+            "readiness": self.readiness,
+            "data_version": str(self.data_version),
+            "routes": routes,
+        }
+
+# WARMUP_INTERVAL마다 데이터 버전을 확인하고, warm이 아닌 페이지를 순서대로 채움
+def run_warmup(status):
+    while True:
+        try:
+            data_version = tuple(sorted(get_data_versions().items()))
+            if data_version != status.data_version:
+                status.reset(data_version)
+            for route in WARMUP_ROUTES:
+                if status.state(route) == "warm":
+                    continue
+                status.set(route, "warming")
+                start = time.perf_counter()
+                try:
+                    warm_route(route)
+                    status.set(route, "warm", seconds=time.perf_counter() - start)
+                except Exception as e:
+                    status.set(route, "failed", seconds=time.perf_counter() - start, error=str(e))
+        except Exception:
+            pass  # 데이터 버전 확인 실패 -> 다음 주기에 재시도
+        time.sleep(WARMUP_INTERVAL)
+
+def readiness_handler(status):
+    class ReadinessHandler(BaseHTTPRequestHandler):
+        # GET /ready: 모든 페이지가 warm이면 200, 아니면 503 / GET /status: 항상 200
+        def do_GET(self):
+            if self.path not in ("/ready", "/status"):
+                self.send_error(404)
+                return
+            snapshot = status.snapshot()
+            body = json.dumps(snapshot, ensure_ascii=False, default=str).encode()
+            self.send_response(200 if snapshot["ready"] or self.path == "/status" else 503)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # 헬스 체크 요청마다 로그를 남기지 않음
+    return ReadinessHandler
+
+@st.cache_resource
+def start_warmup():
+    status = WarmupStatus(WARMUP_ROUTES)
+    threading.Thread(target=run_warmup, args=(status,), name="warmup", daemon=True).start()
+    if READINESS_PORT:
+        try:
+            server = ThreadingHTTPServer((READINESS_HOST, READINESS_PORT), readiness_handler(status))
+            threading.Thread(target=server.serve_forever, name="readiness", daemon=True).start()
+            status.readiness = f"{READINESS_HOST}:{READINESS_PORT}"
+        except OSError as e:
+            # 포트를 이미 사용 중 -> 그 포트는 다른 프로세스의 상태이므로 readiness_port를 레플리카마다 다르게 설정해야 함
+            status.readiness = f"{READINESS_HOST}:{READINESS_PORT} 열기 실패: {e}"
+    return status
+
 ###############################################################################
 # 페이지 분기: 기본 메인 페이지와 등급별 페이지(내용은 동일)
+if WARMUP_ENABLED:
+    start_warmup()
+if IMAGE_PROXY_URL:
+    start_image_proxy()
+
 if page == "main":
     main_page()
-elif page in ["super_champions", "champions", "superchallengers", "challengers", "worldclass"]:
+elif page in GRADE_ROUTES:
     grade_page(page)
-elif page in ["fw", "mf", "df", "gk"]:
+elif page in POSITION_ROUTES:
     position_page(page)
 elif page.startswith("ranker_"):
     ranker_page(page.replace("ranker_", ""))
+elif page == "admin":
+    admin_page()
 elif page.startswith("player_"):
     player_page(page.replace("player_", ""))
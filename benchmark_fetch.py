@@ -0,0 +1,116 @@
+"""
+fetchall -> DataFrame 방식과 컬럼 단위 조회(fetch_columnar)의 시간/메모리 비교
+
+사용법: python benchmark_fetch.py --rows 200000 --repeat 5
+
+redshift_connector 커서는 결과 행을 deque에 담아 두고 fetchall/fetchmany에서 꺼내 준다.
+여기서는 같은 방식으로 동작하는 커서를 만들어 Redshift 없이 두 방식을 비교한다.
+"""
+import argparse
+import datetime
+import random
+import time
+import tracemalloc
+from collections import deque
+from itertools import islice
+
+import pandas as pd
+from redshift_connector.utils.oids import RedshiftOID
+
+from FConline_data import fetch_columnar
+
+# 랭커 선수 목록 쿼리(ranker_page)와 같은 형태의 결과
+SQUAD_COLUMNS = [
+    ("선수이름", RedshiftOID.VARCHAR),
+    ("spid", RedshiftOID.BIGINT),
+    ("season_id", RedshiftOID.INTEGER),
+    ("position", RedshiftOID.INTEGER),
+    ("spgrade", RedshiftOID.INTEGER),
+    ("season_img_url", RedshiftOID.VARCHAR),
+]
+# 포지션 분포 쿼리(position_page)와 같은 형태의 결과
+POSITION_COLUMNS = [
+    ("name", RedshiftOID.VARCHAR),
+    ("num", RedshiftOID.BIGINT),
+    ("avg_spgrade", RedshiftOID.FLOAT),
+    ("created_at", RedshiftOID.TIMESTAMP),
+]
+
+def make_rows(columns, num_rows, seed=0):
+    rng = random.Random(seed)
+    start = datetime.datetime(2025, 1, 1)
+    makers = {
+        RedshiftOID.VARCHAR: lambda i: f"선수{i % 5000}",
+        RedshiftOID.BIGINT: lambda i: rng.randint(100_000_000, 999_999_999),
+        RedshiftOID.INTEGER: lambda i: rng.randint(1_000, 100_000),
+        RedshiftOID.FLOAT: lambda i: rng.random() * 10,
+        RedshiftOID.TIMESTAMP: lambda i: start + datetime.timedelta(seconds=i),
+    }
+    return [[makers[type_code](i) for _, type_code in columns] for i in range(num_rows)]
+
+class DriverLikeCursor:
+    # redshift_connector.Cursor처럼 deque에서 행을 꺼내 주는 커서
+    def __init__(self, columns, rows):
+        self.description = [(name, type_code, None, None, None, None, None) for name, type_code in columns]
+        self._cached_rows = deque(list(row) for row in rows)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return self._cached_rows.popleft()
+        except IndexError:
+            raise StopIteration()
+
+    def fetchall(self):
+        return tuple(self)
+
+    def fetchmany(self, num):
+        return tuple(islice(self, num))
+
+# 기존 run_query의 조회 방식
+def fetch_rows(cursor):
+    data = cursor.fetchall()
+    columns = [desc[0] for desc in cursor.description]
+    return pd.DataFrame(data, columns=columns)
+
+def measure(fetch, columns, rows, repeat):
+    # 시간: tracemalloc 없이 repeat번 중 최솟값
+    times = []
+    for _ in range(repeat):
+        cursor = DriverLikeCursor(columns, rows)
+        start = time.perf_counter()
+        df = fetch(cursor)
+        times.append(time.perf_counter() - start)
+
+    # 메모리: 커서에 행이 담긴 상태에서 추가로 늘어난 최대 사용량
+    tracemalloc.start()
+    cursor = DriverLikeCursor(columns, rows)
+    before = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    fetch(cursor)
+    peak = tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return df, min(times), peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000, help="결과 행 수")
+    parser.add_argument("--repeat", type=int, default=5, help="시간 측정 반복 횟수")
+    args = parser.parse_args()
+
+    for label, columns in [("선수 목록", SQUAD_COLUMNS), ("포지션 분포", POSITION_COLUMNS)]:
+        rows = make_rows(columns, args.rows)
+        df_rows, time_rows, peak_rows = measure(fetch_rows, columns, rows, args.repeat)
+        df_columnar, time_columnar, peak_columnar = measure(fetch_columnar, columns, rows, args.repeat)
+        pd.testing.assert_frame_equal(df_rows, df_columnar)
+
+        print(f"[{label}] {args.rows:,}행 x {len(columns)}컬럼")
+        print(f"  {'방식':<14}{'시간/행(µs)':>14}{'추가 메모리/행(B)':>20}")
+        for name, elapsed, peak in [("fetchall", time_rows, peak_rows), ("fetch_columnar", time_columnar, peak_columnar)]:
+            print(f"  {name:<14}{elapsed / args.rows * 1e6:>14.3f}{peak / args.rows:>20.1f}")
+        print(f"  절약: 시간 {(1 - time_columnar / time_rows) * 100:.1f}%, 메모리 {(1 - peak_columnar / peak_rows) * 100:.1f}%")
+
+if __name__ == "__main__":
+    main()
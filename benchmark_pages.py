@@ -0,0 +1,148 @@
+"""
+페이지별 데이터 조회 시간 측정 (로컬 DuckDB 스냅샷 기준)
+
+사용법:
+  python synthetic_data.py --scale 100k --snapshot-dir /tmp/fc_100k
+  python benchmark_pages.py --snapshot-dir /tmp/fc_100k --save baseline.json
+  (코드 수정 후) python benchmark_pages.py --snapshot-dir /tmp/fc_100k --baseline baseline.json
+
+- 대시보드 스크립트를 streamlit AppTest로 실행해 페이지마다 처음부터 끝까지의 시간을 잰다
+  - cold: st.cache_data/st.cache_resource와 공유 결과 캐시(cache_dir/results)를 비운 직후 (서버를 새로 띄운 뒤 첫 요청)
+  - warm: 같은 페이지를 바로 다시 요청
+- --baseline과 비교해 threshold 이상 느려진 페이지가 있으면 종료 코드 1
+- 이미지 존재 여부는 미리 인덱스에 채워 두어 CDN 응답 시간이 결과에 섞이지 않게 한다
+"""
+import argparse
+import datetime
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import duckdb
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from FConline_data import IMAGE_INDEX_FILE, SNAPSHOT_MANIFEST, ImageAvailabilityIndex, snapshot_path
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "FConline_webpage.py")
+
+GRADE_ROUTES = ["super_champions", "champions", "superchallengers", "challengers", "worldclass"]
+POSITION_ROUTES = ["fw", "mf", "df", "gk"]
+ROUTES = ["main"] + GRADE_ROUTES + POSITION_ROUTES + ["ranker"]
+
+def top_ranker(snapshot_dir):
+    # 가장 최근 랭킹 1위 닉네임 (ranker 페이지 측정용)
+    path = snapshot_path(snapshot_dir, "ranking_info")
+    return duckdb.sql(f"""
+        SELECT gamer_nickname FROM read_parquet('{path}')
+        ORDER BY created_at DESC, ranking LIMIT 1
+    """).fetchone()[0]
+
+def prime_image_index(snapshot_dir, cache_dir):
+    # 모든 spid의 이미지 존재 여부를 대시보드가 쓰는 인덱스 파일에 미리 저장
+    player_path = snapshot_path(snapshot_dir, "player_info")
+    image_path = snapshot_path(snapshot_dir, "player_image_info")
+    rows = duckdb.sql(f"""
+        SELECT p.spid, MAX(CASE WHEN i.url IS NOT NULL THEN 1 ELSE 0 END)
+        FROM read_parquet('{player_path}') p
+        LEFT JOIN read_parquet('{image_path}') i ON p.spid = i.spid
+        GROUP BY p.spid
+    """).fetchall()
+    ImageAvailabilityIndex(os.path.join(cache_dir, IMAGE_INDEX_FILE)).store(dict(rows))
+
+def run_page(page, snapshot_dir, cache_dir, timeout):
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    at.secrets["serving"] = {"mode": "duckdb", "snapshot_dir": snapshot_dir, "cache_dir": cache_dir, "warmup": False}
+    at.query_params["page"] = page
+    start = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - start
+
+    errors = [str(e.value) for e in at.exception] + [str(e.value) for e in at.error]
+    if errors:
+        raise RuntimeError(f"{page} 페이지 실행 오류: {errors[0]}")
+    return elapsed
+
+def measure(snapshot_dir, cache_dir, routes, repeat, timeout):
+    ranker = top_ranker(snapshot_dir)
+    results = {}
+    for route in routes:
+        page = f"ranker_{ranker}" if route == "ranker" else route
+        cold, warm = [], []
+        for _ in range(repeat):
+            st.cache_data.clear()
+            st.cache_resource.clear()
+            shutil.rmtree(os.path.join(cache_dir, "results"), ignore_errors=True)
+            cold.append(run_page(page, snapshot_dir, cache_dir, timeout))
+            warm.append(run_page(page, snapshot_dir, cache_dir, timeout))
+        results[route] = {"cold": statistics.median(cold), "warm": statistics.median(warm)}
+        print(f"  {route:<18}cold {results[route]['cold'] * 1000:>9.1f}ms  warm {results[route]['warm'] * 1000:>9.1f}ms", flush=True)
+    return results
+
+def compare(results, baseline, threshold, min_delta):
+    # 반환값: 느려진 (페이지, 구분) 목록
+    regressions = []
+    print(f"\n{'페이지':<18}{'구분':<6}{'기준(ms)':>10}{'현재(ms)':>10}{'변화':>9}")
+    for route, current in results.items():
+        if route not in baseline:
+            continue
+        for kind in ("cold", "warm"):
+            before, after = baseline[route][kind], current[kind]
+            change = after / before - 1 if before else 0.0
+            regressed = change > threshold and after - before > min_delta
+            if regressed:
+                regressions.append((route, kind))
+            mark = "  <- 느려짐" if regressed else ""
+            print(f"{route:<18}{kind:<6}{before * 1000:>10.1f}{after * 1000:>10.1f}{change * 100:>+8.1f}%{mark}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--snapshot-dir", required=True, help="측정에 사용할 Parquet 스냅샷 폴더 (synthetic_data.py로 생성)")
+    parser.add_argument("--routes", nargs="+", default=ROUTES, choices=ROUTES, help="측정할 페이지")
+    parser.add_argument("--repeat", type=int, default=3, help="페이지별 반복 횟수 (중앙값 사용)")
+    parser.add_argument("--timeout", type=float, default=600, help="페이지 하나의 최대 실행 시간(초)")
+    parser.add_argument("--save", help="측정 결과를 저장할 JSON 파일")
+    parser.add_argument("--baseline", help="비교할 기준 결과 JSON 파일")
+    parser.add_argument("--threshold", type=float, default=0.2, help="느려짐으로 판단할 증가 비율")
+    parser.add_argument("--min-delta", type=float, default=0.02, help="느려짐으로 판단할 최소 증가 시간(초)")
+    args = parser.parse_args()
+
+    snapshot_dir = os.path.abspath(args.snapshot_dir)
+    manifest_path = os.path.join(snapshot_dir, SNAPSHOT_MANIFEST)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    match_rows = manifest.get("match_info", {}).get("rows")
+    print(f"스냅샷: {snapshot_dir} (match_info {match_rows:,}행)" if match_rows else f"스냅샷: {snapshot_dir}")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        prime_image_index(snapshot_dir, cache_dir)
+        results = measure(snapshot_dir, cache_dir, args.routes, args.repeat, args.timeout)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({
+                "measured_at": datetime.datetime.now().isoformat(timespec="seconds"),
+                "match_info_rows": match_rows,
+                "routes": results,
+            }, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("match_info_rows") != match_rows:
+            print(f"주의: 기준 결과의 match_info 행 수({baseline.get('match_info_rows')})가 현재 스냅샷과 다릅니다")
+        regressions = compare(results, baseline["routes"], args.threshold, args.min_delta)
+        if regressions:
+            print(f"\n느려진 페이지 {len(regressions)}개: {', '.join(f'{route}({kind})' for route, kind in regressions)}")
+            sys.exit(1)
+        print("\n느려진 페이지 없음")
+
+if __name__ == "__main__":
+    main()
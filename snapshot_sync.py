@@ -0,0 +1,124 @@
+"""
+Redshift analytics 스키마를 로컬 Parquet 스냅샷으로 저장
+
+사용법: python snapshot_sync.py [--snapshot-dir snapshot] [--tables ranking_info match_info ...]
+
+- 접속 정보는 대시보드와 같은 .streamlit/secrets.toml의 [redshift]를 사용
+- 테이블마다 임시 파일에 쓴 뒤 교체하므로 duckdb 모드로 서비스 중에도 실행할 수 있음
+- 저장이 끝나면 테이블별 행 수와 저장 시각을 _manifest.json에 기록
+"""
+import argparse
+import datetime
+import json
+import os
+import time
+import tomllib
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import redshift_connector
+from redshift_connector.utils.oids import RedshiftOID
+
+from FConline_data import (
+    DEFAULT_SNAPSHOT_DIR,
+    FETCH_BATCH_ROWS,
+    SNAPSHOT_MANIFEST,
+    SNAPSHOT_TABLES,
+    snapshot_path,
+)
+
+SECRETS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".streamlit", "secrets.toml")
+
+# Redshift 타입 -> Parquet(Arrow) 타입 (목록에 없는 타입은 문자열로 저장)
+ARROW_TYPES = {
+    RedshiftOID.SMALLINT: pa.int64(),
+    RedshiftOID.INTEGER: pa.int64(),
+    RedshiftOID.BIGINT: pa.int64(),
+    RedshiftOID.REAL: pa.float64(),
+    RedshiftOID.FLOAT: pa.float64(),
+    RedshiftOID.NUMERIC: pa.float64(),
+    RedshiftOID.BOOLEAN: pa.bool_(),
+    RedshiftOID.DATE: pa.date32(),
+    RedshiftOID.TIMESTAMP: pa.timestamp("us"),
+    RedshiftOID.TIMESTAMPTZ: pa.timestamp("us", tz="UTC"),
+}
+
+def connect(secrets_path=SECRETS_PATH):
+    with open(secrets_path, "rb") as f:
+        secrets = tomllib.load(f)["redshift"]
+    return redshift_connector.connect(
+        host=secrets["host"],
+        database=secrets["database"],
+        user=secrets["user"],
+        password=secrets["password"],
+        port=int(secrets["port"])
+    )
+
+def arrow_column(values, arrow_type):
+    if arrow_type == pa.float64():  # NUMERIC(Decimal)도 실수로 저장
+        values = [None if value is None else float(value) for value in values]
+    elif arrow_type == pa.string():
+        values = [None if value is None else str(value) for value in values]
+    return pa.array(values, type=arrow_type)
+
+def sync_table(conn, table, snapshot_dir, batch_rows=FETCH_BATCH_ROWS):
+    # 테이블 전체를 batch_rows행씩 읽어 Parquet 파일 하나로 저장, 반환값: 행 수
+    path = snapshot_path(snapshot_dir, table)
+    tmp_path = f"{path}.tmp"
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT * FROM analytics.{table}")
+        schema = pa.schema([
+            (desc[0], ARROW_TYPES.get(desc[1], pa.string()))
+            for desc in cursor.description
+        ])
+        num_rows = 0
+        with pq.ParquetWriter(tmp_path, schema) as writer:
+            while True:
+                rows = cursor.fetchmany(batch_rows)
+                if not rows:
+                    break
+                columns = list(zip(*rows))
+                batch = pa.record_batch(
+                    [arrow_column(values, field.type) for values, field in zip(columns, schema)],
+                    schema=schema
+                )
+                writer.write_batch(batch)
+                num_rows += len(rows)
+    finally:
+        cursor.close()
+    os.replace(tmp_path, path)
+    return num_rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--snapshot-dir", default=DEFAULT_SNAPSHOT_DIR, help="Parquet 파일을 저장할 폴더")
+    parser.add_argument("--tables", nargs="+", default=SNAPSHOT_TABLES, choices=SNAPSHOT_TABLES, help="저장할 테이블")
+    parser.add_argument("--secrets", default=SECRETS_PATH, help="Redshift 접속 정보가 있는 secrets.toml")
+    args = parser.parse_args()
+
+    os.makedirs(args.snapshot_dir, exist_ok=True)
+    manifest_path = os.path.join(args.snapshot_dir, SNAPSHOT_MANIFEST)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+
+    conn = connect(args.secrets)
+    try:
+        for table in args.tables:
+            start = time.perf_counter()
+            num_rows = sync_table(conn, table, args.snapshot_dir)
+            manifest[table] = {
+                "rows": num_rows,
+                "synced_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            }
+            print(f"{table}: {num_rows:,}행 ({time.perf_counter() - start:.1f}초)")
+    finally:
+        conn.close()
+
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
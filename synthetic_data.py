@@ -0,0 +1,261 @@
+"""
+analytics 스키마 9개 테이블을 합성 데이터로 만들어 Parquet 스냅샷으로 저장
+
+사용법: python synthetic_data.py --scale 100k [--snapshot-dir snapshot] [--seed 0]
+
+- 저장 형식은 snapshot_sync.py와 같으므로 [serving] mode = "duckdb"로 대시보드를 그대로 띄울 수 있음
+- --scale: match_info 행 수 (1k / 100k / 10m 또는 숫자)
+- 분포
+  - 랭커: 순위가 높을수록 상위 등급, 승률/팀 가치도 높음
+  - 선수: 인기 선수와 최근 시즌에 사용량이 몰리는 Zipf 분포
+  - 포지션: 실제 포메이션(선발 11명 + 후보 7명) 단위로 생성
+  - 강화 등급: 5~8강에 몰린 분포
+"""
+import argparse
+import datetime
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from FConline_data import DEFAULT_SNAPSHOT_DIR, SNAPSHOT_MANIFEST, SNAPSHOT_TABLES, snapshot_path
+
+SCALES = {"1k": 1_000, "100k": 100_000, "10m": 10_000_000}
+
+# 등급 id, 이름, 랭커 비율 (순위가 높은 랭커부터 배정)
+DIVISIONS = [
+    (0, "슈퍼챔피언스", 0.30),
+    (1, "챔피언스", 0.25),
+    (2, "슈퍼챌린저", 0.18),
+    (3, "챌린저", 0.10),
+    (4, "월드클래스", 0.07),
+    (5, "프로", 0.04),
+    (6, "세미프로", 0.03),
+    (7, "유망주", 0.02),
+    (8, "아마추어", 0.01),
+]
+
+POSITION_NAMES = [
+    "GK", "SW", "RWB", "RB", "RCB", "CB", "LCB", "LB", "LWB",
+    "RDM", "CDM", "LDM", "RM", "RCM", "CM", "LCM", "LM", "RAM", "CAM", "LAM",
+    "RF", "CF", "LF", "RW", "RS", "ST", "LS", "LW", "SUB",
+]
+SUB_POSITION = 28
+SQUAD_SUBS = 7
+
+# 포메이션별 선발 포지션 id, 사용 비율
+FORMATIONS = {
+    "4-2-3-1": ([0, 3, 4, 6, 7, 9, 11, 17, 18, 19, 25], 0.35),
+    "4-3-3": ([0, 3, 4, 6, 7, 13, 14, 15, 23, 25, 27], 0.25),
+    "4-4-2": ([0, 3, 4, 6, 7, 12, 13, 15, 16, 24, 26], 0.20),
+    "4-1-2-1-2": ([0, 3, 4, 6, 7, 10, 13, 15, 18, 24, 26], 0.12),
+    "3-4-3": ([0, 4, 5, 6, 12, 13, 15, 16, 23, 25, 27], 0.08),
+}
+
+TEAM_COLORS = [
+    "리버풀", "맨체스터 시티", "레알 마드리드", "FC 바르셀로나", "첼시", "아스널", "토트넘 홋스퍼",
+    "맨체스터 유나이티드", "바이에른 뮌헨", "파리 생제르맹", "유벤투스", "AC 밀란", "인테르",
+    "대한민국", "잉글랜드", "프랑스", "브라질", "아르헨티나", "네덜란드", "포르투갈",
+]
+
+REVIEWS = {
+    1: ["가성비 최고", "몸싸움이 좋아요", "체감 좋습니다", "골 결정력 미쳤음", "꼭 써보세요"],
+    0: ["체감이 별로", "너무 느려요", "가격 대비 아쉬움", "헤더가 약함", "추천 안 함"],
+}
+
+SEASON_IMAGE_URL = "https://ssl.nexon.com/s2/game/fo4/obt/externalAssets/season/s{season_id}.png"
+PLAYER_IMAGE_URL = "https://fco.dn.nexoncdn.co.kr/live/externalAssets/common/playersAction/p{spid}.png"
+
+def parse_scale(value):
+    if value.lower() in SCALES:
+        return SCALES[value.lower()]
+    return int(value.replace(",", "").replace("_", ""))
+
+def zipf_weights(n, exponent):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+def make_dimensions(rng, num_players, num_seasons):
+    # 시즌: 번호가 클수록 최근 시즌, 최근 시즌일수록 많이 사용
+    season_ids = np.sort(rng.choice(np.arange(100, 900), size=num_seasons, replace=False))
+    season_weights = zipf_weights(num_seasons, 0.8)[::-1]
+
+    # 선수(pid)마다 등장하는 시즌 2~6개 -> spid = 시즌 id(3자리) + pid(6자리)
+    pid_weights = zipf_weights(num_players, 1.1)
+    seasons_per_player = rng.integers(2, 7, size=num_players)
+    spid_pid = np.repeat(np.arange(num_players), seasons_per_player)
+    spid_season = np.concatenate([
+        rng.choice(season_ids, size=k, replace=False, p=season_weights) for k in seasons_per_player
+    ])
+    spids = spid_season.astype(np.int64) * 1_000_000 + spid_pid + 1
+    spid_weights = pid_weights[spid_pid] * season_weights[np.searchsorted(season_ids, spid_season)]
+    spid_weights /= spid_weights.sum()
+
+    player_info = pd.DataFrame({"spid": spids, "name": [f"선수{pid + 1:05d}" for pid in spid_pid]})
+    season_info = pd.DataFrame({
+        "season_id": season_ids.astype(str),
+        "name": [f"시즌{season_id}" for season_id in season_ids],
+        "image_url": [SEASON_IMAGE_URL.format(season_id=season_id) for season_id in season_ids],
+    })
+    division_info = pd.DataFrame({
+        "division_id": [division_id for division_id, _, _ in DIVISIONS],
+        "division_name": [name for _, name, _ in DIVISIONS],
+    })
+    position_info = pd.DataFrame({"spposition": np.arange(len(POSITION_NAMES)), "name": POSITION_NAMES})
+    return player_info, season_info, division_info, position_info, spid_weights
+
+def make_rankings(rng, num_rankers, snapshot_times):
+    # 닉네임 풀에서 스냅샷마다 num_rankers명을 골라 순위를 매김 (순위가 높을수록 상위 등급)
+    nicknames = np.array([f"감독{i:05d}" for i in range(int(num_rankers * 1.3))], dtype=object)
+    skill = rng.normal(size=len(nicknames))
+    formation_names = list(FORMATIONS)
+    formation_weights = np.array([weight for _, weight in FORMATIONS.values()])
+    favorite_formation = rng.choice(len(formation_names), size=len(nicknames), p=formation_weights)
+
+    division_ids = np.concatenate([
+        np.full(round(num_rankers * ratio), division_id) for division_id, _, ratio in DIVISIONS
+    ])
+    division_ids = np.resize(division_ids, num_rankers)  # 반올림 오차 보정
+
+    frames = []
+    for created_at in snapshot_times:
+        noisy = skill + rng.normal(scale=0.3, size=len(nicknames))
+        order = np.argsort(-noisy)[:num_rankers]
+        ranking = np.arange(1, num_rankers + 1)
+        strength = 1 - ranking / num_rankers  # 1위 ~ 1, 꼴찌 ~ 0
+        games = rng.integers(200, 2000, size=num_rankers)
+        winning_rate = np.clip(rng.normal(50 + 25 * strength, 5), 20, 95).round(2)
+        total_draw = (games * rng.uniform(0.05, 0.15, size=num_rankers)).astype(np.int64)
+        total_win = ((games - total_draw) * winning_rate / 100).astype(np.int64)
+        frames.append(pd.DataFrame({
+            "gamer_nickname": nicknames[order],
+            "gamer_level": rng.integers(100, 3000, size=num_rankers),
+            "ranking": ranking,
+            "division_id": division_ids,
+            "team_worth": (rng.lognormal(mean=30 + 3 * strength, sigma=0.6)).astype(np.int64),
+            "winning_rate": winning_rate,
+            "total_win": total_win,
+            "total_draw": total_draw,
+            "total_lose": games - total_draw - total_win,
+            "formation": np.array(formation_names, dtype=object)[favorite_formation[order]],
+            "created_at": created_at,
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+def make_matches(rng, num_rows, ranking_info, spids, spid_weights):
+    # 스쿼드(선발 11명 + 후보 7명) 단위로 생성한 뒤 num_rows행으로 자름
+    squad_size = len(next(iter(FORMATIONS.values()))[0]) + SQUAD_SUBS
+    num_squads = -(-num_rows // squad_size)
+    owners = ranking_info.iloc[rng.integers(0, len(ranking_info), size=num_squads)]
+
+    starters = np.array([positions for positions, _ in FORMATIONS.values()])
+    formation_index = pd.Index(list(FORMATIONS)).get_indexer(owners["formation"])
+    positions = np.hstack([starters[formation_index], np.full((num_squads, SQUAD_SUBS), SUB_POSITION)]).ravel()[:num_rows]
+
+    spid = rng.choice(spids, size=num_rows, p=spid_weights)
+    spgrade_weights = np.array([2, 3, 5, 8, 14, 18, 20, 16, 9, 5], dtype=float)
+    return pd.DataFrame({
+        "gamer_nickname": np.repeat(owners["gamer_nickname"].to_numpy(), squad_size)[:num_rows],
+        "spid": spid,
+        "season_id": spid // 1_000_000,
+        "position": positions,
+        "spgrade": rng.choice(np.arange(1, 11), size=num_rows, p=spgrade_weights / spgrade_weights.sum()),
+        "created_at": np.repeat(owners["created_at"].to_numpy(), squad_size)[:num_rows],
+    })
+
+def generate(num_rows, num_rankers=1000, num_snapshots=1, seed=0) -> dict:
+    """
+    num_rows: match_info 행 수
+    num_rankers: 스냅샷 하나에 들어가는 랭커 수
+    num_snapshots: ranking_info/match_info에 적재된 일별 스냅샷 수
+    반환값: {테이블 이름: DataFrame}
+    """
+    rng = np.random.default_rng(seed)
+    num_players = int(np.clip(num_rows // 50, 200, 5000))
+    player_info, season_info, division_info, position_info, spid_weights = make_dimensions(rng, num_players, 40)
+
+    latest = datetime.datetime.combine(datetime.date.today(), datetime.time(6))
+    snapshot_times = [latest - datetime.timedelta(days=days) for days in range(num_snapshots)][::-1]
+    ranking_info = make_rankings(rng, num_rankers, snapshot_times)
+    match_info = make_matches(rng, num_rows, ranking_info, player_info["spid"].to_numpy(), spid_weights)
+
+    nicknames = ranking_info["gamer_nickname"].unique()
+    team_color_info = pd.DataFrame({
+        "gamer_nickname": nicknames,
+        "team_color": rng.choice(TEAM_COLORS, size=len(nicknames), p=zipf_weights(len(TEAM_COLORS), 1.0)),
+    })
+
+    # 후기: 많이 쓰는 선수일수록 후기가 많고, 70%가 긍정
+    num_reviews = max(100, num_rows // 20)
+    prediction = (rng.random(num_reviews) < 0.7).astype(np.int64)
+    review_index = rng.integers(0, len(REVIEWS[1]), size=num_reviews)
+    player_review_info = pd.DataFrame({
+        "spid": rng.choice(player_info["spid"].to_numpy(), size=num_reviews, p=spid_weights),
+        "review": np.where(
+            prediction == 1,
+            np.array(REVIEWS[1], dtype=object)[review_index],
+            np.array(REVIEWS[0], dtype=object)[review_index]
+        ),
+        "prediction": prediction,
+    })
+
+    # 이미지: 선수 90%만 이미지가 있음
+    has_image = rng.random(len(player_info)) < 0.9
+    image_spids = player_info["spid"].to_numpy()[has_image]
+    player_image_info = pd.DataFrame({
+        "spid": image_spids,
+        "url": [PLAYER_IMAGE_URL.format(spid=spid) for spid in image_spids],
+    })
+
+    return {
+        "ranking_info": ranking_info,
+        "match_info": match_info,
+        "player_info": player_info,
+        "season_info": season_info,
+        "division_info": division_info,
+        "position_info": position_info,
+        "team_color_info": team_color_info,
+        "player_review_info": player_review_info,
+        "player_image_info": player_image_info,
+    }
+
+def write_snapshot(tables: dict, snapshot_dir):
+    # snapshot_sync.py와 같은 형식(테이블별 Parquet 파일 + _manifest.json)으로 저장
+    os.makedirs(snapshot_dir, exist_ok=True)
+    manifest = {}
+    for table in SNAPSHOT_TABLES:
+        df = tables[table]
+        path = snapshot_path(snapshot_dir, table)
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+        manifest[table] = {
+            "rows": len(df),
+            "synced_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "synthetic": True,
+        }
+    with open(os.path.join(snapshot_dir, SNAPSHOT_MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", default="100k", help="match_info 행 수 (1k / 100k / 10m 또는 숫자)")
+    parser.add_argument("--snapshot-dir", default=DEFAULT_SNAPSHOT_DIR, help="Parquet 파일을 저장할 폴더")
+    parser.add_argument("--rankers", type=int, default=1000, help="스냅샷 하나의 랭커 수")
+    parser.add_argument("--snapshots", type=int, default=1, help="일별 랭킹 스냅샷 수")
+    parser.add_argument("--seed", type=int, default=0, help="난수 시드")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    tables = generate(parse_scale(args.scale), args.rankers, args.snapshots, args.seed)
+    manifest = write_snapshot(tables, args.snapshot_dir)
+    for table, info in manifest.items():
+        print(f"{table}: {info['rows']:,}행")
+    print(f"{args.snapshot_dir}에 저장 ({time.perf_counter() - start:.1f}초)")
+
+if __name__ == "__main__":
+    main()